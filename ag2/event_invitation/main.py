@@ -1,6 +1,12 @@
 import os
+import hashlib
 import json
 import logging
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 from pathlib import Path
 import pandas as pd
@@ -27,6 +33,54 @@ config_list = [
     }
 ]
 
+# Optional shared on-disk response cache (see ../../shared/llm_cache.py), enabled
+# by LLM_CACHE_PATH. AG2 passes `http_client` through to its OpenAI client.
+llm_cache = None
+if os.environ.get("LLM_CACHE_PATH"):
+    sys.path.append(str(Path(__file__).resolve().parents[2]))
+    from shared.llm_cache import LLMCache
+
+    llm_cache = LLMCache.from_env()
+    for config in config_list:
+        config["http_client"] = llm_cache.httpx_client()
+
+# Maximum number of Drafter chats in flight at once. Set to 1 to draft guests
+# one after another.
+DRAFT_CONCURRENCY = max(1, int(os.environ.get("DRAFT_CONCURRENCY", "8")))
+
+# "per_guest" drafts every invitation from scratch. "template" drafts one
+# template per (language, formality) bucket and fills in name/context locally;
+# guests whose context is longer than TEMPLATE_CONTEXT_MAX_WORDS words (or
+# contains full sentences) still get their own Drafter call.
+DRAFT_MODES = ("per_guest", "template")
+DRAFT_MODE = os.environ.get("DRAFT_MODE", "per_guest").lower()
+TEMPLATE_CONTEXT_MAX_WORDS = int(os.environ.get("TEMPLATE_CONTEXT_MAX_WORDS", "6"))
+TEMPLATE_NAME_SLOT = "{{name}}"
+TEMPLATE_CONTEXT_SLOT = "{{context}}"
+
+# Profiling converts guests.csv to profiles.json locally by default. Set
+# USE_AGENT_PROFILER=true to have the Profiler agent write and run the script.
+USE_AGENT_PROFILER = os.environ.get("USE_AGENT_PROFILER", "false").lower() == "true"
+PROFILE_CHUNK_SIZE = int(os.environ.get("PROFILE_CHUNK_SIZE", "10000"))
+
+# Validation checks the invitations locally by default. Set
+# USE_AGENT_VALIDATOR=true to have the Validator agent write and run the script.
+USE_AGENT_VALIDATOR = os.environ.get("USE_AGENT_VALIDATOR", "false").lower() == "true"
+
+# The event date as it may appear in English or Indonesian invitations.
+EVENT_DATE_PATTERN = re.compile(
+    r"(?:October|Oct\.?)\s+1(?:st)?,?\s+2025"
+    r"|\b1\s+(?:October|Oktober|Okt\.?)\s+2025"
+    r"|2025-10-01|\b0?1/10/2025",
+    re.IGNORECASE,
+)
+EVENT_VENUE_PATTERN = re.compile(r"\bJakarta\b", re.IGNORECASE)
+
+# Guests whose profile row and drafting prompt are unchanged since the last run
+# (and whose invitation exists and did not fail validation) are not redrafted.
+# Set FORCE_REDRAFT=true to ignore the checkpoint and draft everyone again.
+FORCE_REDRAFT = os.environ.get("FORCE_REDRAFT", "false").lower() == "true"
+
 # --- Workspace Setup ---
 workdir = Path("result")
 workdir.mkdir(exist_ok=True)
@@ -61,17 +115,12 @@ The script must:
 Provide ONLY the directly executable Python code. End your response with FINISH after code block."""
 )
 
-drafter = AssistantAgent(
-    name="Drafter",
-    llm_config={"config_list": config_list},
-    system_message="""You are a content automation engineer.
+DRAFTER_SYSTEM_MESSAGE = """You are a content automation engineer.
 Your ONLY task is to generate the personalized markdown invitation text for a single guest based on the provided profile data.
 Do NOT include any code or extra explanations.
 The invitation should be for the "Neosantara AI tech hub" on October 1, 2025, at the Jakarta.
 The invitation MUST include the guest's name, and be in the specified language and formality.
 Provide ONLY the personalized markdown invitation text. End your response with FINISH."""
-)
-
 
 validator = AssistantAgent(
     name="Validator",
@@ -178,6 +227,355 @@ manager_validation = GroupChatManager(
 )
 
 
+# --- Native Profiling ---
+
+def build_profiles(csv_path, profiles_path, chunksize=PROFILE_CHUNK_SIZE):
+    """Stream guests.csv into profiles.json without a model call or subprocess.
+
+    The CSV is read `chunksize` rows at a time and each row is appended to the
+    JSON array as it is converted, so memory stays flat for very large guest
+    lists. All columns are kept as strings (e.g. guest ids like "G001").
+    Returns the number of profiles written.
+    """
+    count = 0
+    with open(profiles_path, 'w', encoding='utf-8') as out:
+        out.write("[")
+        for chunk in pd.read_csv(csv_path, dtype=str, keep_default_na=False, chunksize=chunksize):
+            for row in chunk.to_dict(orient="records"):
+                out.write(",\n  " if count else "\n  ")
+                json.dump(row, out, ensure_ascii=False)
+                count += 1
+        out.write("\n]\n" if count else "]\n")
+    return count
+
+
+def run_agent_profiling():
+    """Let the Profiler agent write the CSV -> JSON script and Code_Executor run it."""
+    user_proxy.initiate_chat(
+        manager_profiling,
+        message="Generate profiles.json from guests.csv.",
+        clear_history=True,
+    )
+    # Check if the profiling stage completed successfully by looking at the group chat messages
+    # and the existence of profiles.json
+    if not manager_profiling.groupchat.messages:
+        logger.warning("Profiling group chat did not return expected result or messages.")
+        return False
+    logger.info("Profiling group chat finished. Checking for profiles.json.")
+    if (workdir / 'profiles.json').exists():
+        logger.info("profiles.json found. Profiling stage considered successful.")
+        return True
+    logger.error("profiles.json not found after profiling stage.")
+    return False
+
+
+# --- Concurrent Drafting ---
+
+# AG2 agents keep per-conversation history on the agent objects, so concurrent
+# chats must not share them. Each worker thread gets its own proxy/drafter pair.
+_draft_agents = threading.local()
+
+
+def get_draft_agents():
+    if not hasattr(_draft_agents, "pair"):
+        proxy = UserProxyAgent(
+            name="User_Proxy",
+            is_termination_msg=lambda msg: "FINISH" in msg.get("content", ""),
+            human_input_mode="NEVER",
+            code_execution_config=False,
+        )
+        worker_drafter = AssistantAgent(
+            name="Drafter",
+            llm_config={"config_list": config_list},
+            system_message=DRAFTER_SYSTEM_MESSAGE,
+        )
+        _draft_agents.pair = (proxy, worker_drafter)
+    return _draft_agents.pair
+
+
+def build_draft_message(guest):
+    return f"""Generate a personalized invitation text for the following guest:
+    Guest ID: {guest['guest_id']}
+    Name: {guest['name']}
+    Language: {guest['language']}
+    Formality: {guest['formality']}
+    Context: {guest['context']}
+
+    The event is the "Neosantara AI Tech Hub" on October 1, 2025, at the Jakarta.
+    Provide ONLY the personalized markdown invitation text. End your response with FINISH.
+    """
+
+
+def build_template_message(language, formality):
+    return f"""Generate a reusable invitation template for every guest with these preferences:
+    Language: {language}
+    Formality: {formality}
+
+    Write {TEMPLATE_NAME_SLOT} exactly where the guest's name goes and {TEMPLATE_CONTEXT_SLOT} exactly
+    where their role or background goes. Use each placeholder at least once and do not translate them.
+    The event is the "Neosantara AI Tech Hub" on October 1, 2025, at the Jakarta.
+    Provide ONLY the markdown invitation template. End your response with FINISH.
+    """
+
+
+def run_drafter(message, label):
+    """Run one Drafter chat and return the reply text, or None on failure."""
+    proxy, worker_drafter = get_draft_agents()
+    logger.info(f"Requesting invitation text for {label}")
+    try:
+        chat_result = proxy.initiate_chat(
+            worker_drafter,
+            message=message,
+            clear_history=True,
+        )
+    except Exception as e:
+        logger.error(f"Drafter failed for {label}: {e}")
+        return None
+
+    if chat_result and chat_result.chat_history:
+        return chat_result.chat_history[-1]["content"].replace("FINISH", "").strip()
+    return None
+
+
+def draft_invitation(guest):
+    return run_drafter(build_draft_message(guest), f"guest: {guest['name']} ({guest['guest_id']})")
+
+
+def draft_template(bucket):
+    """Draft the shared template for a (language, formality) bucket, or None if unusable."""
+    language, formality = bucket
+    template = run_drafter(build_template_message(language, formality), f"template: {language}/{formality}")
+    if template and TEMPLATE_NAME_SLOT in template:
+        return template
+    logger.warning(f"Template for {language}/{formality} is missing {TEMPLATE_NAME_SLOT}; drafting its guests individually.")
+    return None
+
+
+def needs_personalization(context):
+    """Free-form context (sentences, long notes) cannot be slotted into a template."""
+    context = context.strip()
+    return len(context.split()) > TEMPLATE_CONTEXT_MAX_WORDS or any(mark in context for mark in ".!?\n")
+
+
+def fill_template(template, guest):
+    return template.replace(TEMPLATE_NAME_SLOT, guest['name']).replace(TEMPLATE_CONTEXT_SLOT, guest['context'])
+
+
+def check_draft_mode(mode):
+    if mode not in DRAFT_MODES:
+        raise ValueError(f"Unknown DRAFT_MODE {mode!r}; expected one of: {', '.join(DRAFT_MODES)}")
+
+
+check_draft_mode(DRAFT_MODE)
+
+
+def drafting_prompt(guest, mode=DRAFT_MODE):
+    """The Drafter prompt an invitation for `guest` is generated from in `mode`."""
+    if mode == "template" and not needs_personalization(guest['context']):
+        return build_template_message(guest['language'], guest['formality'])
+    return build_draft_message(guest)
+
+
+def draft_invitations(guest_profiles, max_in_flight=DRAFT_CONCURRENCY, mode=DRAFT_MODE, checkpoint=None):
+    """Draft every guest with at most `max_in_flight` Drafter chats running at once.
+
+    In "template" mode one template is drafted per (language, formality) bucket
+    and filled in locally; only guests whose context needs free-form
+    personalization (or whose bucket template failed) get their own chat.
+
+    Results are consumed in guest order (a finished chat waits for the guests
+    before it), so files are written and logged in the same order regardless of
+    which chat happens to finish first. Each saved invitation is recorded in
+    `checkpoint` as soon as it is written. Returns the number of invitations written.
+    """
+    check_draft_mode(mode)
+    start = time.perf_counter()
+    written = 0
+    llm_calls = 0
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        templates = {}
+        if mode == "template":
+            buckets = sorted({(g['language'], g['formality']) for g in guest_profiles
+                              if not needs_personalization(g['context'])})
+            templates = dict(zip(buckets, pool.map(draft_template, buckets)))
+            llm_calls += len(buckets)
+
+        def draft(guest):
+            template = templates.get((guest['language'], guest['formality']))
+            if template and not needs_personalization(guest['context']):
+                return fill_template(template, guest), False
+            return draft_invitation(guest), True
+
+        for guest, (invitation_text, used_llm) in zip(guest_profiles, pool.map(draft, guest_profiles)):
+            llm_calls += used_llm
+            guest_id = guest['guest_id']
+            name = guest['name']
+            if invitation_text is None:
+                logger.warning(f"Drafter did not return a message for guest: {name} ({guest_id})")
+                continue
+            invitation_file_path = workdir / f"invitation_{guest_id}.md"
+            with open(invitation_file_path, 'w', encoding='utf-8') as outfile:
+                outfile.write(invitation_text)
+            if checkpoint is not None:
+                # Record the prompt the next run's checkpoint.is_current() compares
+                # against. A guest whose bucket template failed was drafted on its
+                # own this time, but is still due its template prompt next run.
+                checkpoint.record_draft(guest, drafting_prompt(guest, mode))
+            written += 1
+            logger.info(f"Invitation saved for {name} to '{invitation_file_path}'.")
+
+    elapsed = time.perf_counter() - start
+    rate = written / elapsed if elapsed > 0 else 0.0
+    attempted_rate = len(guest_profiles) / elapsed if elapsed > 0 else 0.0
+    logger.info(
+        f"Drafted {written}/{len(guest_profiles)} invitations in {elapsed:.2f}s "
+        f"({rate:.2f} guests/s written, {attempted_rate:.2f} guests/s attempted, max_in_flight={max_in_flight})."
+    )
+    if mode == "template":
+        # Buckets of one guest cost a template call each, so template mode can
+        # save nothing (or cost extra); only report a saving when there is one.
+        per_guest_calls = llm_calls - len(templates)
+        saved = len(guest_profiles) - llm_calls
+        logger.info(
+            f"Template mode used {llm_calls} Drafter calls for {len(guest_profiles)} guests "
+            f"({len(templates)} template calls, {per_guest_calls} per-guest calls"
+            + (f", {saved} calls saved)." if saved > 0 else ").")
+        )
+    return written
+
+
+# --- Checkpointing ---
+
+def content_hash(*parts):
+    digest = hashlib.sha256()
+    for part in parts:
+        digest.update(part.encode('utf-8'))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class DraftCheckpoint:
+    """Per-guest manifest of drafted invitations, stored as JSON lines in the workdir.
+
+    Each entry holds the guest_id, a hash of the profile row, a hash of the
+    drafting prompt (including the system message and model) and the latest
+    validation result. Entries are appended as invitations are written, so a
+    crashed run keeps everything drafted before the crash; later lines for the
+    same guest win, and `compact()` rewrites the file with one line per guest.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.entries = {}
+        if self.path.exists():
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # a line cut short by a crash
+                    self.entries[entry["guest_id"]] = entry
+
+    @staticmethod
+    def profile_hash(guest):
+        return content_hash(json.dumps(guest, sort_keys=True, ensure_ascii=False))
+
+    @staticmethod
+    def prompt_hash(prompt):
+        return content_hash(config_list[0]["model"], DRAFTER_SYSTEM_MESSAGE, prompt)
+
+    def is_current(self, guest, prompt):
+        """True if `guest` was drafted from the same inputs and the draft is still usable."""
+        entry = self.entries.get(guest['guest_id'])
+        return (
+            entry is not None
+            and entry["profile_hash"] == self.profile_hash(guest)
+            and entry["prompt_hash"] == self.prompt_hash(prompt)
+            and entry.get("status") != "FAIL"
+            and (workdir / f"invitation_{guest['guest_id']}.md").exists()
+        )
+
+    def record_draft(self, guest, prompt):
+        entry = {
+            "guest_id": guest['guest_id'],
+            "profile_hash": self.profile_hash(guest),
+            "prompt_hash": self.prompt_hash(prompt),
+            "status": None,
+        }
+        self.entries[entry["guest_id"]] = entry
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def record_validation(self, report):
+        for result in report:
+            entry = self.entries.get(result.get("guest_id"))
+            if entry is not None:
+                entry["status"] = str(result.get("status", "")).upper() or None
+        self.compact()
+
+    def compact(self):
+        tmp_path = self.path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self.entries.values():
+                f.write(json.dumps(entry) + "\n")
+        os.replace(tmp_path, self.path)
+
+
+# --- Native Validation ---
+
+def read_invitation(guest_id):
+    try:
+        return (workdir / f"invitation_{guest_id}.md").read_text(encoding='utf-8')
+    except FileNotFoundError:
+        return None
+
+
+def validate_invitations(guest_profiles, report_path, max_workers=DRAFT_CONCURRENCY):
+    """Check every invitation for the guest's name, event date and venue in one pass.
+
+    Files are read concurrently, then the date and venue patterns run over the
+    whole column at once. Writes `validation_report.json` with one
+    {'guest_id', 'status', 'issues'} entry per guest and returns that list.
+    """
+    start = time.perf_counter()
+    guest_ids = [g['guest_id'] for g in guest_profiles]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        texts = pd.Series(list(pool.map(read_invitation, guest_ids)), dtype=object)
+
+    found = texts.notna()
+    bodies = texts.fillna("")
+    has_date = bodies.str.contains(EVENT_DATE_PATTERN)
+    has_venue = bodies.str.contains(EVENT_VENUE_PATTERN)
+    has_name = [g['name'].casefold() in body.casefold() for g, body in zip(guest_profiles, bodies)]
+
+    report = []
+    for i, guest_id in enumerate(guest_ids):
+        if not found[i]:
+            issues = [f"invitation_{guest_id}.md not found"]
+        else:
+            issues = []
+            if not has_name[i]:
+                issues.append("guest name missing")
+            if not has_date[i]:
+                issues.append("event date missing")
+            if not has_venue[i]:
+                issues.append("venue missing")
+        report.append({"guest_id": guest_id, "status": "FAIL" if issues else "PASS", "issues": issues})
+
+    with open(report_path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+
+    failed = sum(1 for entry in report if entry["status"] == "FAIL")
+    logger.info(
+        f"Validated {len(report)} invitations in {time.perf_counter() - start:.2f}s: "
+        f"{len(report) - failed} passed, {failed} failed. Report saved to '{report_path}'."
+    )
+    for entry in report:
+        if entry["issues"]:
+            logger.warning(f"{entry['guest_id']}: {', '.join(entry['issues'])}")
+    return report
+
+
 # --- Main Execution Block ---
 if __name__ == "__main__":
     logger.info("Starting AI-Powered Event Invitation Workflow...")
@@ -188,28 +586,13 @@ if __name__ == "__main__":
     else:
         try:
             logger.info("--- Starting Profiling Stage ---")
-            # Initiate the profiling group chat. The result is the manager itself.
-            user_proxy.initiate_chat(
-                manager_profiling,
-                message="Generate profiles.json from guests.csv.",
-                clear_history=True,
-            )
-            # Check if the profiling stage completed successfully by looking at the group chat messages
-            # and the existence of profiles.json
-            profiling_successful = False
-            # Access the group chat messages directly from the manager's groupchat object
-            if manager_profiling.groupchat.messages:
-                 # Check the last message or look for success indicators in the chat history if needed
-                 # For now, rely on the file check and logs
-                 logger.info("Profiling group chat finished. Checking for profiles.json.")
-                 if (workdir / 'profiles.json').exists():
-                      profiling_successful = True
-                      logger.info("profiles.json found. Profiling stage considered successful.")
-                 else:
-                      logger.error("profiles.json not found after profiling stage.")
+            if USE_AGENT_PROFILER:
+                profiling_successful = run_agent_profiling()
             else:
-                 logger.warning("Profiling group chat did not return expected result or messages.")
-
+                start = time.perf_counter()
+                profile_count = build_profiles(guests_file, workdir / 'profiles.json')
+                logger.info(f"Wrote {profile_count} profiles to profiles.json in {time.perf_counter() - start:.2f}s.")
+                profiling_successful = profile_count > 0
 
             if profiling_successful:
                 logger.info("--- Profiling Stage Finished ---")
@@ -220,48 +603,35 @@ if __name__ == "__main__":
                     with open(profiles_path, 'r', encoding='utf-8') as f:
                         guest_profiles = json.load(f)
 
-                    for guest in guest_profiles:
-                        guest_id = guest['guest_id']
-                        name = guest['name']
-                        language = guest['language']
-                        formality = guest['formality']
-                        context = guest['context']
-
-                        # Construct message for Drafter
-                        message = f"""Generate a personalized invitation text for the following guest:
-    Guest ID: {guest_id}
-    Name: {name}
-    Language: {language}
-    Formality: {formality}
-    Context: {context}
-
-    The event is the "Neosantara AI Tech Hub" on October 1, 2025, at the Jakarta.
-    Provide ONLY the personalized markdown invitation text. End your response with FINISH.
-    """
-                        logger.info(f"Requesting invitation text for guest: {name} ({guest_id})")
-
-                        chat_result = user_proxy.initiate_chat(
-                             drafter,
-                             message=message,
-                             clear_history=True
+                    checkpoint = DraftCheckpoint(workdir / 'checkpoint.jsonl')
+                    if FORCE_REDRAFT:
+                        pending = guest_profiles
+                    else:
+                        pending = [g for g in guest_profiles if not checkpoint.is_current(g, drafting_prompt(g))]
+                        logger.info(
+                            f"Checkpoint: {len(guest_profiles) - len(pending)} guests unchanged, "
+                            f"{len(pending)} to draft."
                         )
-
-                        if chat_result and chat_result.chat_history:
-                            invitation_text = chat_result.chat_history[-1]["content"].replace("FINISH", "").strip()
-                            invitation_file_path = workdir / f"invitation_{guest_id}.md"
-                            with open(invitation_file_path, 'w', encoding='utf-8') as outfile:
-                                outfile.write(invitation_text)
-                            logger.info(f"Invitation saved for {name} to '{invitation_file_path}'.")
-                        else:
-                             logger.warning(f"Drafter did not return a message for guest: {name} ({guest_id})")
+                    if pending:
+                        draft_invitations(pending, checkpoint=checkpoint)
                     logger.info("--- Invitation Drafting Stage Finished ---")
 
                     logger.info("--- Starting Validation Stage ---")
-                    user_proxy.initiate_chat(
-                        manager_validation,
-                        message="Validate the generated invitation files.",
-                        clear_history=True,
-                    )
+                    report_path = workdir / 'validation_report.json'
+                    if USE_AGENT_VALIDATOR:
+                        user_proxy.initiate_chat(
+                            manager_validation,
+                            message="Validate the generated invitation files.",
+                            clear_history=True,
+                        )
+                        report = []
+                        if report_path.exists():
+                            with open(report_path, 'r', encoding='utf-8') as f:
+                                report = json.load(f)
+                    else:
+                        report = validate_invitations(guest_profiles, report_path)
+                    # Guests that failed validation are redrafted on the next run.
+                    checkpoint.record_validation(report)
                     logger.info("--- Validation Stage Finished ---")
 
                 else:
@@ -272,6 +642,8 @@ if __name__ == "__main__":
 
 
             logger.info("Workflow finished successfully!")
+            if llm_cache:
+                logger.info(llm_cache.summary())
         except Exception as e:
             logger.error(f"The workflow failed with an unexpected error: {e}")
             raise
\ No newline at end of file
@@ -1,6 +1,14 @@
 import asyncio
+import json
 import logging
+import re
+import sqlite3
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
 from datetime import datetime
+from functools import lru_cache
 import os
 from agno.agent import Agent
 from agno.models.openai.like import OpenAILike
@@ -13,13 +21,267 @@ logging.basicConfig(
     format="%(asctime)s - %(message)s"
 )
 
+class SearchCache:
+    """Debate-scoped cache for web search results.
+
+    Queries are normalized (case, punctuation, word order) so rephrasings of
+    the same search share one entry. Results live in memory for `ttl` seconds
+    and, with `path`, in a SQLite file that later debates reuse. Identical
+    lookups that arrive while a search is already running wait for that
+    search instead of issuing their own.
+    """
+
+    def __init__(self, ttl=3600, path=None):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+        self._memory = {}
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        if path:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute("CREATE TABLE IF NOT EXISTS searches (key TEXT PRIMARY KEY, result TEXT, stored REAL)")
+
+    @staticmethod
+    def normalize(query):
+        return " ".join(sorted(re.findall(r"\w+", query.lower())))
+
+    def _load(self, key, now):
+        entry = self._memory.get(key)
+        if entry is None and self._db is not None:
+            entry = self._db.execute("SELECT stored, result FROM searches WHERE key = ?", (key,)).fetchone()
+            if entry is not None:
+                self._memory[key] = entry
+        if entry is not None and now - entry[0] <= self.ttl:
+            return entry[1]
+        return None
+
+    def _store(self, key, result, now):
+        self._memory[key] = (now, result)
+        if self._db is not None:
+            self._db.execute("INSERT OR REPLACE INTO searches VALUES (?, ?, ?)", (key, result, now))
+            self._db.commit()
+
+    def get_or_fetch(self, query, fetch, **params):
+        """Return the cached result for `query`, or call `fetch()` once to produce it."""
+        key = self.normalize(query) + json.dumps(params, sort_keys=True)
+        owner = False
+        with self._lock:
+            cached = self._load(key, time.time())
+            if cached is not None:
+                self.hits += 1
+                return cached
+            future = self._inflight.get(key)
+            if future is not None:
+                self.merged += 1
+            else:
+                self.misses += 1
+                future = self._inflight[key] = Future()
+                owner = True
+        if not owner:
+            return future.result()
+
+        try:
+            result = fetch()
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+        with self._lock:
+            self._store(key, result, time.time())
+        future.set_result(result)
+        return result
+
+    def summary(self):
+        return f"Search cache: {self.hits} hits, {self.misses} searches, {self.merged} merged in-flight"
+
+
+class CachedDuckDuckGoTools(DuckDuckGoTools):
+    """DuckDuckGoTools whose searches go through a shared SearchCache."""
+
+    def __init__(self, search_cache, **kwargs):
+        self.search_cache = search_cache
+        super().__init__(**kwargs)
+
+    def web_search(self, query: str, max_results: int = 5) -> str:
+        """Use this function to search the web for a query.
+
+        Args:
+            query(str): The query to search for.
+            max_results (optional, default=5): The maximum number of results to return.
+
+        Returns:
+            The search results from the web.
+        """
+        return self.search_cache.get_or_fetch(
+            query,
+            lambda: super(CachedDuckDuckGoTools, self).web_search(query=query, max_results=max_results),
+            max_results=max_results,
+        )
+
+
+@lru_cache(maxsize=None)
+def _encoding():
+    """The tiktoken encoding, or None to fall back to estimates.
+
+    Loaded on first use rather than at import: tiktoken downloads the BPE file
+    the first time, and an offline machine must still be able to run debates.
+    """
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        logging.info(f"tiktoken unavailable, estimating token counts: {e}")
+        return None
+
+
+def count_tokens(text):
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+# Tool-call echoes like "duckduckgo_search(query=...) completed in 0.84s." that
+# agno streams into replies carry no argument.
+_TOOL_ECHO = re.compile(r"\w+\([^)]*\) completed in [\d.]+s\.\s*")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+
+
+class DebateContext:
+    """Token-budgeted rolling context for debate prompts.
+
+    Keeps two things, both updated incrementally as statements come in:
+
+    - a summary per position: the lead sentence (the claim) of each of its
+      statements, oldest points dropped once the position exceeds
+      `summary_tokens`;
+    - a window of the most recent full turns, oldest turns dropped once the
+      window exceeds `window_tokens`.
+
+    A rendered prompt context therefore stays bounded no matter how many
+    rounds the debate runs.
+    """
+
+    def __init__(self, summary_tokens=60, window_tokens=300):
+        self.summary_tokens = summary_tokens
+        self.window_tokens = window_tokens
+        self.summaries = {}  # position -> deque of (point, tokens)
+        self.turns = deque()  # (round, position, text, tokens)
+        self._window_used = 0
+
+    @staticmethod
+    def _clean(statement):
+        text = _TOOL_ECHO.sub("", statement)
+        return " ".join(text.replace("*", "").replace("#", "").split())
+
+    @staticmethod
+    def _fit(text, budget):
+        """Cut `text` at a word boundary so it fits in `budget` tokens."""
+        if count_tokens(text) <= budget:
+            return text
+        words = text.split()
+        lo, hi = 1, len(words)
+        while lo < hi:  # longest prefix that still fits
+            mid = (lo + hi + 1) // 2
+            if count_tokens(" ".join(words[:mid]) + "...") <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        return " ".join(words[:lo]) + "..."
+
+    def add(self, round_num, position, statement):
+        text = self._clean(statement)
+        if not text:
+            return
+
+        point = self._fit(_SENTENCE_END.split(text, 1)[0], self.summary_tokens)
+        points = self.summaries.setdefault(position, deque())
+        if not points or points[-1][0] != point:
+            points.append((point, count_tokens(point)))
+            while sum(tokens for _, tokens in points) > self.summary_tokens and len(points) > 1:
+                points.popleft()
+
+        text = self._fit(text, self.window_tokens)
+        tokens = count_tokens(text)
+        self.turns.append((round_num, position, text, tokens))
+        self._window_used += tokens
+        while self._window_used > self.window_tokens and len(self.turns) > 1:
+            self._window_used -= self.turns.popleft()[3]
+
+    def render(self, exclude_position=None):
+        """Prompt context: every position's key points, then the recent turns."""
+        lines = ["Key points so far:"]
+        for position, points in self.summaries.items():
+            lines.append(f"- {position}: " + " / ".join(point for point, _ in points))
+        lines.append("Recent turns:")
+        for round_num, position, text, _ in self.turns:
+            if position != exclude_position:
+                lines.append(f"- {position} (round {round_num}): {text}")
+        return "\n".join(lines)
+
+
+class TranscriptWriter:
+    """Streaming sink for the debate transcript.
+
+    Text is appended to `path` (or to any object with write/flush passed as
+    `stream`) as each chunk arrives instead of being held in memory until the
+    end, and is flushed at round boundaries so a crash keeps every finished
+    round. With `history_path`, every debate_history entry is also written as
+    one JSON line.
+    """
+
+    def __init__(self, path="efficient_tool_debate.md", stream=None, history_path=None):
+        self.path = path if stream is None else None
+        self.stream = stream if stream is not None else open(path, "w", encoding="utf-8")
+        self.history = open(history_path, "w", encoding="utf-8") if history_path else None
+
+    def write(self, text):
+        self.stream.write(text)
+
+    def log_entry(self, entry):
+        if self.history:
+            self.history.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def flush(self):
+        self.stream.flush()
+        if self.history:
+            self.history.flush()
+
+    def close(self):
+        self.flush()
+        if self.path is not None:
+            self.stream.close()
+        if self.history:
+            self.history.close()
+
+    def read(self):
+        """The full transcript text: read back from `path`, or taken from an
+        in-memory `stream` such as io.StringIO. None for other streams."""
+        if self.path is not None:
+            with open(self.path, encoding="utf-8") as f:
+                return f.read()
+        getvalue = getattr(self.stream, "getvalue", None)
+        return getvalue() if callable(getvalue) else None
+
+
 class EfficientToolDebateSystem:
-    def __init__(self, topic, positions, image_context=None):
+    def __init__(self, topic, positions, image_context=None, search_cache=None, context=None):
         self.topic = topic
         self.positions = positions
         self.image_context = image_context
         self.debate_history = []
         self.agents = {}
+        self.transcript = None
+        # Bounded prompt context, so prompt size does not grow with rounds
+        self.context = context or DebateContext()
+        # One search cache for every debater, the moderator and the pre-fetch
+        self.search_cache = search_cache or SearchCache()
 
         # Use nusantara-base for tool support (text + vision, low cost)
         api_key = os.environ.get("NAI_API_KEY")
@@ -32,7 +294,7 @@ class EfficientToolDebateSystem:
                     api_key=api_key,
                     base_url=base_url
                 ),
-                tools=[DuckDuckGoTools()],
+                tools=[CachedDuckDuckGoTools(self.search_cache)],
                 markdown=True,
                 instructions=f"You are debating: {topic}. Position: {position}. Use web search for evidence. Analyze image if provided. Keep responses <70 words, persuasive, and counter opponents."
             )
@@ -44,124 +306,220 @@ class EfficientToolDebateSystem:
                 api_key=api_key,
                 base_url=base_url
             ),
-            tools=[DuckDuckGoTools()],  # Optional for fact-checking summaries
+            tools=[CachedDuckDuckGoTools(self.search_cache)],  # Optional for fact-checking summaries
             markdown=True,
             instructions="Neutral moderator: Summarize arguments fairly, highlight strengths/weaknesses. Max 40 words per summary."
         )
+        # Shared toolkit for evidence pre-fetched outside the agents (concurrent mode)
+        self.search_tools = CachedDuckDuckGoTools(self.search_cache)
         logging.info(f"Debate init: {topic}, model: nusantara-base (tools enabled)")
 
-    async def start_debate(self, rounds=2):
-        """Efficient debate with tools and streaming"""
-        logging.info(f"Starting {rounds}-round debate: {self.topic}")
-        markdown_output = f"# Efficient Tool Debate: {self.topic}\n\n**Model:** nusantara-base (Tools: Web Search)\n\n"
+    def _emit(self, content):
+        print(content, end="", flush=True)
+        self.transcript.write(content)
+
+    def _record(self, round_num, position, statement):
+        entry = {"round": round_num, "position": position, "statement": statement.strip()}
+        self.debate_history.append(entry)
+        self.context.add(round_num, position, entry["statement"])
+        self.transcript.log_entry(entry)
+
+    async def _stream(self, agent, prompt, queue=None):
+        """Stream one agent reply; chunks are emitted live, or go to `queue` when fanned out."""
+        text = ""
+        try:
+            async for chunk in agent.arun(prompt, stream=True):
+                if chunk.content:  # Check if content is not None
+                    if queue is None:
+                        self._emit(chunk.content)
+                    else:
+                        queue.put_nowait(chunk.content)
+                    text += chunk.content
+        finally:
+            if queue is not None:
+                queue.put_nowait(None)  # end of this buffer, even on failure
+        return text
+
+    async def _turn(self, heading, agent, prompt):
+        """Write a transcript section heading, then stream the agent's reply under it."""
+        self.transcript.write(f"### {heading}\n")
+        text = await self._stream(agent, prompt)
+        self.transcript.write("\n\n")
+        return text
+
+    async def _fan_out(self, calls):
+        """Run independent (heading, agent, prompt) turns concurrently, emitting them in call order.
+
+        Every call streams into its own buffer. The first buffer is emitted live;
+        the others are emitted as soon as the calls before them have finished, so
+        the console and transcript read exactly as in sequential mode.
+
+        If one call fails, the others are cancelled right away instead of
+        finishing model and search calls whose result is thrown away.
+        """
+        queues = [asyncio.Queue() for _ in calls]
+        tasks = [
+            asyncio.create_task(self._stream(agent, prompt, q))
+            for (_, agent, prompt), q in zip(calls, queues)
+        ]
+
+        def cancel_siblings(task):
+            if not task.cancelled() and task.exception() is not None:
+                for other in tasks:
+                    other.cancel()
+
+        for task in tasks:
+            task.add_done_callback(cancel_siblings)
+        try:
+            for (heading, _, _), queue in zip(calls, queues):
+                self.transcript.write(f"### {heading}\n")
+                while (content := await queue.get()) is not None:
+                    self._emit(content)
+                self.transcript.write("\n\n")
+            results = await asyncio.gather(*tasks, return_exceptions=True)
+        finally:
+            for task in tasks:
+                task.cancel()  # no-op for finished tasks
+        # Raise the call that failed, not the CancelledError of a sibling.
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+        return results
+
+    async def _prefetch_evidence(self):
+        """Search evidence for every position at once, before the openings."""
+        async def search(position):
+            query = f"{position} arguments {self.topic}"
+            try:
+                return await asyncio.to_thread(self.search_tools.web_search, query=query, max_results=3)
+            except Exception as e:  # evidence is a bonus; agents can still search themselves
+                logging.warning(f"Evidence pre-fetch failed for {position}: {e}")
+                return ""
+        results = await asyncio.gather(*(search(p) for p in self.positions))
+        return dict(zip(self.positions, results))
+
+    def _argument_prompt(self, position):
+        return (
+            f"Topic: {self.topic} | Position: {position}\n"
+            f"{self.context.render(exclude_position=position)}\n"
+            f"Counter the opponents and reinforce with web evidence (<70 words)."
+        )
+
+    async def start_debate(self, rounds=2, concurrent=False, transcript=None):
+        """Efficient debate with tools and streaming.
+
+        The transcript is streamed to `transcript` (a TranscriptWriter, by
+        default writing efficient_tool_debate.md) as it is generated.
+
+        With `concurrent=True`, evidence for every position is pre-fetched in
+        parallel, openings run in parallel, and each round's arguments run in
+        parallel, every position countering the opponents' previous-round
+        statements. Output order matches sequential mode.
+        """
+        logging.info(f"Starting {rounds}-round debate: {self.topic} (concurrent={concurrent})")
+        self.transcript = transcript or TranscriptWriter()
+        try:
+            await self._run_debate(rounds, concurrent)
+        finally:
+            self.transcript.close()
+
+        logging.info(self.search_cache.summary())
+        print(f"\nDebate complete! Transcript: {self.transcript.path or 'custom stream'}")
+        print(self.search_cache.summary())
+        return {
+            "topic": self.topic,
+            "positions": self.positions,
+            "transcript": self.transcript.read(),
+            "transcript_path": self.transcript.path,
+        }
+
+    async def _run_debate(self, rounds, concurrent):
+        self.transcript.write(f"# Efficient Tool Debate: {self.topic}\n\n**Model:** nusantara-base (Tools: Web Search)\n\n")
 
         # Merge image analysis into first opening (saves a call)
         image_analysis = ""
         if self.image_context:
             logging.info(f"Analyzing image: {self.image_context}")
             image_prompt = f"Briefly analyze this image for '{self.topic}': {self.image_context}."
-            async for chunk in self.agents[self.positions[0]].arun(image_prompt, stream=True):
-                if chunk.content:  # Check if content is not None
-                    print(chunk.content, end="", flush=True)
-                    image_analysis += chunk.content
-            markdown_output += f"## Image Analysis\n![Image]({self.image_context})\n{image_analysis}\n\n"
+            self.transcript.write(f"## Image Analysis\n![Image]({self.image_context})\n")
+            image_analysis = await self._stream(self.agents[self.positions[0]], image_prompt)
+            self.transcript.write("\n\n")
             logging.info("Image analysis done")
 
         # Opening statements
-        markdown_output += "## Openings\n"
+        self.transcript.write("## Openings\n")
+        evidence = await self._prefetch_evidence() if concurrent else {}
+        prompts = []
         for position in self.positions:  # Fixed: use self.positions
-            logging.info(f"Streaming opening: {position}")
             prompt = (
                 f"Opening on '{self.topic}' ({position}). Include image: {image_analysis}." if image_analysis and position == self.positions[0] else
                 f"Opening on '{self.topic}' ({position}). Use web search for evidence."
             )
-            markdown_output += f"### {position}\n"
-            opening = ""
-            async for chunk in self.agents[position].arun(prompt, stream=True):
-                if chunk.content: # Check if content is not None
-                    print(chunk.content, end="", flush=True)
-                    opening += chunk.content
-            markdown_output += opening + "\n\n"
-            self.debate_history.append({
-                "round": 0,
-                "position": position,
-                "statement": opening.strip()
-            })
+            if evidence.get(position):
+                prompt += f"\nPre-fetched web evidence:\n{evidence[position]}"
+            prompts.append(prompt)
+
+        if concurrent:
+            logging.info(f"Streaming {len(self.positions)} openings concurrently")
+            openings = await self._fan_out([(p, self.agents[p], prompt) for p, prompt in zip(self.positions, prompts)])
+        else:
+            openings = []
+            for position, prompt in zip(self.positions, prompts):
+                logging.info(f"Streaming opening: {position}")
+                openings.append(await self._turn(position, self.agents[position], prompt))
+        for position, opening in zip(self.positions, openings):
+            self._record(0, position, opening)
             logging.info(f"Opening done: {position}")
+        self.transcript.flush()
 
         # Debate rounds
         for round_num in range(1, rounds + 1):
-            markdown_output += f"## Round {round_num}\n"
-            for position in self.positions:
-                logging.info(f"Streaming argument: {position}, round {round_num}")
-                recent_opponent = next(
-                    (entry["statement"][:100] for entry in self.debate_history[-1:] if entry["position"] != position),
-                    ""
-                )
-                prompt = (
-                    f"Topic: {self.topic} | Position: {position}\n"
-                    f"Recent opponent: {recent_opponent}\n"
-                    f"Counter and reinforce with web evidence (<70 words)."
-                )
-                markdown_output += f"### {position}\n"
-                argument = ""
-                async for chunk in self.agents[position].arun(prompt, stream=True):
-                    if chunk.content: # Check if content is not None
-                        print(chunk.content, end="", flush=True)
-                        argument += chunk.content
-                markdown_output += argument + "\n\n"
-                self.debate_history.append({
-                    "round": round_num,
-                    "position": position,
-                    "statement": argument.strip()
-                })
-                logging.info(f"Argument done: {position}, round {round_num}")
+            self.transcript.write(f"## Round {round_num}\n")
+            if concurrent:
+                # Everyone answers the previous round at once: the context is
+                # only updated after the whole round has finished.
+                calls = [(p, self.agents[p], self._argument_prompt(p)) for p in self.positions]
+                logging.info(f"Streaming {len(calls)} arguments concurrently, round {round_num}")
+                arguments = await self._fan_out(calls)
+                for position, argument in zip(self.positions, arguments):
+                    self._record(round_num, position, argument)
+                    logging.info(f"Argument done: {position}, round {round_num}")
+            else:
+                for position in self.positions:
+                    logging.info(f"Streaming argument: {position}, round {round_num}")
+                    argument = await self._turn(position, self.agents[position], self._argument_prompt(position))
+                    self._record(round_num, position, argument)
+                    logging.info(f"Argument done: {position}, round {round_num}")
 
             # Moderator summary
             logging.info(f"Streaming summary: round {round_num}")
-            recent_args = "\n".join([f"{e['position']}: {e['statement'][:50]}..." for e in self.debate_history[-len(self.positions):]])
-            prompt = f"Summarize Round {round_num} on '{self.topic}':\n{recent_args}\n<40 words."
-            markdown_output += "### Moderator\n"
-            summary = ""
-            async for chunk in self.moderator.arun(prompt, stream=True):
-                if chunk.content: # Check if content is not None
-                    print(chunk.content, end="", flush=True)
-                    summary += chunk.content
-            markdown_output += summary + "\n\n"
-            self.debate_history.append({
-                "round": round_num,
-                "position": "Moderator",
-                "statement": summary.strip()
-            })
+            prompt = f"Summarize Round {round_num} on '{self.topic}':\n{self.context.render()}\n<40 words."
+            summary = await self._turn("Moderator", self.moderator, prompt)
+            self._record(round_num, "Moderator", summary)
+            self.transcript.flush()
             logging.info(f"Summary done: round {round_num}")
 
         # Final assessment
         logging.info("Streaming final assessment")
-        recent_history = "\n".join([f"{e['position']}: {e['statement'][:80]}..." for e in self.debate_history[-4:]])
-        prompt = f"Final analysis of '{self.topic}' debate:\n{recent_history}\nKey arguments, strengths, gaps, neutral verdict (<80 words)."
-        markdown_output += "## Final Assessment\n"
-        assessment = ""
-        async for chunk in self.moderator.arun(prompt, stream=True):
-            if chunk.content: # Check if content is not None
-                print(chunk.content, end="", flush=True)
-                assessment += chunk.content
-        markdown_output += assessment + "\n"
+        prompt = f"Final analysis of '{self.topic}' debate:\n{self.context.render()}\nKey arguments, strengths, gaps, neutral verdict (<80 words)."
+        self.transcript.write("## Final Assessment\n")
+        assessment = await self._stream(self.moderator, prompt)
+        self.transcript.write("\n")
+        self._record(rounds + 1, "Moderator", assessment)
         logging.info("Final assessment done")
 
-        # Save output
-        with open("efficient_tool_debate.md", "w") as f:
-            f.write(markdown_output)
-
-        print("\nDebate complete! Transcript: efficient_tool_debate.md")
-        return {"topic": self.topic, "positions": self.positions, "transcript": markdown_output}
-
 # Example usage
 async def main():
     debate = EfficientToolDebateSystem(
         topic="Should AI development be regulated?",
         positions=["Pro-regulation", "Anti-regulation"],
        # image_context="https://example.com/image.png"  # Optional Multi-modal input
+        search_cache=SearchCache(ttl=3600, path="search_cache.sqlite"),
+    )
+    await debate.start_debate(
+        rounds=2,
+        transcript=TranscriptWriter("efficient_tool_debate.md", history_path="debate_history.jsonl"),
     )
-    await debate.start_debate(rounds=2)
 
-await main()
\ No newline at end of file
+if __name__ == "__main__":
+    asyncio.run(main())
\ No newline at end of file
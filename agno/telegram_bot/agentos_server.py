@@ -13,8 +13,13 @@ This single file can run in three modes via AGENT_MODE:
 
   team      (default)  A Researcher + Writer multi-agent Team. The leader
                        delegates to a researcher (with web search) and a writer.
+                       A rule-based router answers small talk and short
+                       messages with a single agent and only escalates the
+                       rest to the team.
   agent                A single general-purpose agent.
-  workflow             A two-step Draft -> Edit pipeline.
+  workflow             A Draft -> Edit pipeline. By default the Editor polishes
+                       each paragraph as soon as the Drafter finishes it, and
+                       short, clean drafts skip editing altogether.
 
 Required env:
     TELEGRAM_TOKEN                  Bot token from @BotFather.
@@ -27,39 +32,162 @@ Optional env:
     APP_ENV                         "development" skips webhook secret checks.
     TELEGRAM_WEBHOOK_SECRET_TOKEN   Required in production.
     AGENT_INSTRUCTIONS              Override instructions (agent mode only).
+    TEAM_ROUTER                     "false" sends every message to the team
+                                    (default: true, team mode only).
+    ROUTER_MAX_WORDS                Messages up to this many words without
+                                    research cues skip the team (default: 8).
+    ROUTER_MODEL                    Optional small model id that classifies
+                                    messages the rules can't decide. Without
+                                    it, those go to the team.
+    WORKFLOW_PIPELINE               streaming | sequential   (default: streaming)
+                                    "sequential" edits the whole draft after it
+                                    is complete (workflow mode).
+    EDIT_SKIP_CHARS                 Drafts up to this length that look finished
+                                    are sent unedited (default: 280, 0 = always
+                                    edit; streaming pipeline only).
     ENABLE_WEB_SEARCH               "true" gives the Researcher DuckDuckGo web
                                     search (team mode). Off by default since DDG
                                     can be rate-limited in some environments.
+    SESSION_BACKEND                 sqlite | postgres   (default: sqlite)
     SESSION_DB_FILE                 SQLite file (default: /tmp/telegram_sessions.db).
+                                    Opened in WAL mode so several workers can
+                                    read while one writes.
+    SESSION_DB_URL                  Postgres URL for the postgres backend, e.g.
+                                    postgresql+psycopg://ai:ai@localhost:5432/ai
+    SESSION_POOL_SIZE               Connections kept per worker (default: 5).
+    SESSION_SLOW_MS                 Log session reads/writes slower than this
+                                    (default: 100). Per-operation timings are
+                                    served at GET /metrics/sessions.
+    WEB_CONCURRENCY                 Uvicorn worker processes (default: 1).
+    WEBHOOK_QUEUE                   Ingest mode: "memory" or a redis:// URL. The
+                                    webhook then only validates, dedupes and
+                                    queues updates, and a worker pool runs the
+                                    agent. Unset: agno's default webhook.
+                                    Use Redis when WEB_CONCURRENCY > 1.
+    QUEUE_WORKERS                   Updates processed concurrently per worker
+                                    process (default: 8).
+    QUEUE_MAX_SIZE                  Queued updates before the webhook answers
+                                    503 so Telegram retries later (default: 1000).
 
 After starting, point Telegram's webhook at the server (see README):
     curl "https://api.telegram.org/bot${TELEGRAM_TOKEN}/setWebhook?url=${PUBLIC_URL}/telegram/webhook"
 """
 
+import asyncio
+import contextlib
+import functools
+import json
 import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from typing import TYPE_CHECKING, Optional
 
 from agno.agent import Agent
-from agno.db.sqlite import SqliteDb
+from agno.db.base import BaseDb
 from agno.models.neosantara import Neosantara
 from agno.os.app import AgentOS
 from agno.os.interfaces.telegram import Telegram
-from agno.team import Team
-from agno.workflow.step import Step
-from agno.workflow.steps import Steps
-from agno.workflow.workflow import Workflow
+from agno.os.interfaces.telegram.security import validate_webhook_secret_token
+from fastapi import BackgroundTasks, HTTPException, Request
+
+if TYPE_CHECKING:
+    from agno.team import Team
+    from agno.workflow.workflow import Workflow
+
+_MODULE_LOADED = time.perf_counter()
 
 MODE = os.environ.get("AGENT_MODE", "team").lower()
 MODEL_ID = os.environ.get("NEOSANTARA_MODEL", "gemini-3-flash")
 PORT = int(os.environ.get("PORT", "7777"))
+SESSION_BACKEND = os.environ.get("SESSION_BACKEND", "sqlite").lower()
 SESSION_DB_FILE = os.environ.get("SESSION_DB_FILE", "/tmp/telegram_sessions.db")
+SESSION_DB_URL = os.environ.get("SESSION_DB_URL")
+SESSION_POOL_SIZE = int(os.environ.get("SESSION_POOL_SIZE", "5"))
+SESSION_SLOW_MS = float(os.environ.get("SESSION_SLOW_MS", "100"))
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+WEBHOOK_QUEUE = os.environ.get("WEBHOOK_QUEUE", "").strip()
+QUEUE_WORKERS = int(os.environ.get("QUEUE_WORKERS", "8"))
+QUEUE_MAX_SIZE = int(os.environ.get("QUEUE_MAX_SIZE", "1000"))
+DEDUP_TTL_SECONDS = 24 * 3600  # Telegram stops redelivering an update well within a day
+TEAM_ROUTER = os.environ.get("TEAM_ROUTER", "true").lower() == "true"
+ROUTER_MAX_WORDS = int(os.environ.get("ROUTER_MAX_WORDS", "8"))
+ROUTER_MODEL = os.environ.get("ROUTER_MODEL")
+ROUTER_LONG_WORDS = 40  # messages this long always go to the team
+WORKFLOW_PIPELINE = os.environ.get("WORKFLOW_PIPELINE", "streaming").lower()
+EDIT_SKIP_CHARS = int(os.environ.get("EDIT_SKIP_CHARS", "280"))
+PARAGRAPH_BREAK = re.compile(r"\n\s*\n")
+CODE_FENCE = re.compile(r"^[ \t]*(```|~~~)", re.MULTILINE)
+
+SMALL_TALK = re.compile(
+    r"^\W*(hi|hello|hey|yo|hiya|halo|hai|sup|what'?s up|how are you|good (morning|afternoon|evening|night)"
+    r"|gm|gn|thanks?( you)?|thx|ty|ok(ay)?|k|cool|nice|great|lol|haha\w*|bye|see you)\b",
+    re.IGNORECASE,
+)
+RESEARCH_CUES = re.compile(
+    r"https?://|\b(research|compare|comparison|versus|vs\.?|explain|analy[sz]e|summari[sz]e|history of"
+    r"|difference between|pros and cons|latest|news|sources?|statistics|in depth|detailed|why"
+    r"|how (does|do|did|can|to))\b",
+    re.IGNORECASE,
+)
+
+# Session reads and writes the agents, teams and workflows go through.
+SESSION_METHODS = (
+    "get_session",
+    "get_sessions",
+    "upsert_session",
+    "upsert_sessions",
+    "rename_session",
+    "delete_session",
+    "delete_sessions",
+)
+
+
+_model = None
+_duckduckgo = None
 
 
 def model() -> Neosantara:
-    """A fresh Neosantara model instance (reads NEOSANTARA_API_KEY)."""
-    return Neosantara(id=MODEL_ID)
+    """The Neosantara model (reads NEOSANTARA_API_KEY), shared so every member reuses one client and connection pool."""
+    global _model
+    if _model is None:
+        _model = Neosantara(id=MODEL_ID)
+    return _model
+
 
+def web_search(query: str, max_results: int = 5) -> str:
+    """Use this function to search the web for a query.
 
-def build_agent(db: SqliteDb) -> Agent:
+    Args:
+        query (str): The query to search for.
+        max_results (optional, default=5): The maximum number of results to return.
+
+    Returns:
+        The search results from the web, as JSON.
+    """
+    # DuckDuckGoTools is only loaded the first time the Researcher actually searches.
+    global _duckduckgo
+    if _duckduckgo is None:
+        from agno.tools.duckduckgo import DuckDuckGoTools
+
+        _duckduckgo = DuckDuckGoTools()
+    return _duckduckgo.web_search(query, max_results)
+
+
+def process_uptime() -> float:
+    """Seconds since this process started, so cold start includes interpreter boot and imports."""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks since boot); fields after the
+            # parenthesised command name start at field 3.
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        return time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, AttributeError, ValueError):  # not Linux: count from when this module loaded
+        return time.perf_counter() - _MODULE_LOADED
+
+
+def build_agent(db: Optional[BaseDb], post_hooks: Optional[list] = None) -> Agent:
     return Agent(
         name="Neosantara Telegram Bot",
         model=model(),
@@ -70,22 +198,23 @@ def build_agent(db: SqliteDb) -> Agent:
                 "You are a helpful assistant on Telegram. Keep responses concise and friendly.",
             )
         ],
-        add_history_to_context=True,
+        add_history_to_context=db is not None,
         num_history_runs=3,
         add_datetime_to_context=True,
         markdown=True,
+        post_hooks=post_hooks,
     )
 
 
-def build_team(db: SqliteDb) -> Team:
+def build_team(db: Optional[BaseDb], post_hooks: Optional[list] = None) -> "Team":
+    from agno.team import Team
+
     # Web search makes the Researcher stronger, but DuckDuckGo can be rate-limited
     # or blocked depending on the host's egress. It is opt-in via ENABLE_WEB_SEARCH
     # so the demo stays smooth by default; the team still coordinates without it.
     researcher_tools = []
     if os.environ.get("ENABLE_WEB_SEARCH", "false").lower() == "true":
-        from agno.tools.duckduckgo import DuckDuckGoTools
-
-        researcher_tools = [DuckDuckGoTools()]
+        researcher_tools = [web_search]
 
     researcher = Agent(
         name="Researcher",
@@ -110,19 +239,174 @@ def build_team(db: SqliteDb) -> Team:
             "Use the Researcher to gather facts, then the Writer to craft the reply.",
             "Keep responses concise for Telegram.",
         ],
-        add_history_to_context=True,
+        add_history_to_context=db is not None,
         num_history_runs=3,
         add_datetime_to_context=True,
         markdown=True,
+        post_hooks=post_hooks,
+    )
+
+
+def classify_message(text: str) -> tuple:
+    """Rule-based route for a message: ("quick" | "team" | None, reason). None means undecided."""
+    words = len(text.split())
+    if RESEARCH_CUES.search(text):
+        return "team", "research_cue"
+    if words >= ROUTER_LONG_WORDS:
+        return "team", "long"
+    if SMALL_TALK.match(text):
+        return "quick", "small_talk"
+    if words <= ROUTER_MAX_WORDS:
+        return "quick", "short"
+    return None, "undecided"
+
+
+class RouterMetrics:
+    """Router decisions and per-route run latency, used to estimate what skipping the team saved."""
+
+    def __init__(self, window: int = 1000):
+        self.decisions: Counter = Counter()  # (route, reason) -> count
+        self._latency = {"quick": deque(maxlen=window), "team": deque(maxlen=window)}
+        self.saved_s = 0.0
+
+    def decide(self, route: str, reason: str) -> str:
+        self.decisions[(route, reason)] += 1
+        print(f"router: {route} ({reason})", flush=True)
+        return route
+
+    def post_hook(self, route: str):
+        """Agent/team post-hook that records how long the run on `route` took."""
+
+        def record_latency(run_output) -> None:
+            metrics = run_output.metrics
+            if metrics is None:
+                return
+            seconds = metrics.duration
+            if seconds is None and metrics.timer is not None:
+                seconds = metrics.timer.elapsed
+            if seconds is not None:
+                self.record(route, seconds)
+
+        return record_latency
+
+    def record(self, route: str, seconds: float) -> None:
+        team = self._latency["team"]
+        if route == "quick" and team:
+            self.saved_s += max(0.0, sorted(team)[len(team) // 2] - seconds)
+        self._latency[route].append(seconds)
+
+    def summary(self) -> dict:
+        routes: dict = {}
+        for (route, reason), count in self.decisions.items():
+            routes.setdefault(route, {})[reason] = count
+        latency = {
+            route: round(sorted(values)[len(values) // 2], 3) for route, values in self._latency.items() if values
+        }
+        quick = sum(routes.get("quick", {}).values())
+        return {
+            "decisions": routes,
+            "p50_latency_s": latency,
+            # Compared against the median team run seen so far.
+            "estimated_saved_s": round(self.saved_s, 2),
+            # A team run takes at least three model calls (leader, Researcher, Writer).
+            "model_calls_saved_min": 2 * quick,
+        }
+
+
+router_metrics = RouterMetrics()
+
+
+def build_routed_team(db: BaseDb) -> "Workflow":
+    """The team behind a cheap router: small talk and short messages go to a single agent."""
+    from agno.workflow.router import Router
+    from agno.workflow.step import Step
+    from agno.workflow.workflow import Workflow
+
+    # Sessions and history belong to the workflow here; steps that persisted
+    # under the same session id would clash with it.
+    quick = build_agent(None, post_hooks=[router_metrics.post_hook("quick")])
+    team = build_team(None, post_hooks=[router_metrics.post_hook("team")])
+    classifier = None
+    if ROUTER_MODEL:
+        classifier = Agent(
+            name="Router",
+            model=Neosantara(id=ROUTER_MODEL),
+            instructions=[
+                "Classify the user's Telegram message. Reply with exactly one word:",
+                "QUICK for chit-chat or anything one assistant can answer from general knowledge,",
+                "TEAM for questions that need research, several facts or a careful write-up.",
+            ],
+        )
+
+    async def route_message(step_input) -> str:
+        text = (step_input.get_input_as_string() or "").strip()
+        route, reason = classify_message(text)
+        if route is None and classifier is not None:
+            try:
+                answer = (await classifier.arun(text)).content or ""
+                route, reason = ("quick" if "QUICK" in answer.upper() else "team"), "model"
+            except Exception as exc:  # fall back to the safe choice
+                print(f"router model failed: {exc}", flush=True)
+        if route is None:
+            route, reason = "team", "default"
+        return router_metrics.decide(route, reason)
+
+    return Workflow(
+        name="Neosantara Research Team",
+        description="Routes trivial messages to a single agent and the rest to the research team.",
+        steps=[
+            Router(
+                name="route",
+                selector=route_message,
+                choices=[Step(name="quick", agent=quick), Step(name="team", team=team)],
+            )
+        ],
+        db=db,
+        add_workflow_history_to_steps=True,
+        num_history_runs=3,
     )
 
 
-def build_workflow(db: SqliteDb) -> Workflow:
+def draft_is_clean(text: str) -> bool:
+    """Cheap check that a draft can go out unedited: short, finished and without repeated sentences."""
+    text = text.strip()
+    if not text or len(text) > EDIT_SKIP_CHARS or text[-1].isalnum():
+        return False
+    sentences = [s.strip().lower() for s in re.split(r"(?<=[.!?])\s+", text) if s.strip()]
+    return len(sentences) == len(set(sentences))
+
+
+def split_paragraphs(text: str) -> tuple:
+    """Split streamed text into finished paragraphs and the unfinished tail.
+
+    Blank lines inside a fenced code block do not end a paragraph, so a block
+    is edited as one piece; while a fence is still open it stays in the tail.
+    """
+    pieces = PARAGRAPH_BREAK.split(text)
+    breaks = PARAGRAPH_BREAK.findall(text)
+    finished, current = [], pieces[0]
+    for brk, piece in zip(breaks, pieces[1:]):
+        if len(CODE_FENCE.findall(current)) % 2:
+            current += brk + piece
+        else:
+            finished.append(current)
+            current = piece
+    return finished, current
+
+
+def build_workflow(db: BaseDb) -> "Workflow":
+    from agno.workflow.step import Step
+    from agno.workflow.steps import Steps
+    from agno.workflow.workflow import Workflow
+
     drafter = Agent(
         name="Drafter",
         model=model(),
         instructions="Draft a response to the user's message. Be helpful and informative.",
     )
+    if WORKFLOW_PIPELINE == "streaming":
+        return build_streaming_workflow(db, drafter)
+
     editor = Agent(
         name="Editor",
         model=model(),
@@ -148,20 +432,415 @@ def build_workflow(db: SqliteDb) -> Workflow:
     )
 
 
-db = SqliteDb(session_table="telegram_sessions", db_file=SESSION_DB_FILE)
+def build_streaming_workflow(db: BaseDb, drafter: Agent) -> "Workflow":
+    """Draft -> Edit where the Editor works on each paragraph while the Drafter is still writing.
+
+    Only the last paragraph's edit is left once the draft is done, so a reply
+    takes about one generation plus one short edit instead of two full
+    generations. Drafts that pass `draft_is_clean` are sent unedited.
+    """
+    from agno.run.agent import RunContentEvent
+    from agno.workflow.step import Step
+    from agno.workflow.types import StepOutput
+    from agno.workflow.workflow import Workflow
+
+    editor = Agent(
+        name="Editor",
+        model=model(),
+        instructions=[
+            "You polish one paragraph of a Telegram reply for clarity and conciseness.",
+            "Keep its meaning, language and formatting. Reply with the edited paragraph only.",
+        ],
+    )
+
+    async def edit(paragraph: str) -> str:
+        try:
+            return (await editor.arun(paragraph)).content or paragraph
+        except Exception as exc:  # an unedited paragraph beats a failed reply
+            print(f"paragraph edit failed: {exc}", flush=True)
+            return paragraph
+
+    async def draft_and_edit(step_input) -> StepOutput:
+        started = time.perf_counter()
+        draft, tail = "", ""
+        edits = []  # one task per finished paragraph, in order
+        async for event in drafter.arun(step_input.get_input_as_string() or "", stream=True):
+            if isinstance(event, RunContentEvent) and event.content:
+                draft += event.content
+                finished, tail = split_paragraphs(tail + event.content)
+                edits.extend(asyncio.create_task(edit(p.strip())) for p in finished if p.strip())
+        drafted = time.perf_counter()
+
+        if draft_is_clean(draft):
+            for task in edits:
+                task.cancel()
+            content, edited = draft.strip(), "skipped"
+        else:
+            if tail.strip():
+                edits.append(asyncio.create_task(edit(tail.strip())))
+            content = "\n\n".join(await asyncio.gather(*edits))
+            edited = f"{len(edits)} paragraphs"
+        print(
+            f"workflow: draft {drafted - started:.2f}s, edit tail {time.perf_counter() - drafted:.2f}s ({edited})",
+            flush=True,
+        )
+        return StepOutput(content=content)
+
+    return Workflow(
+        name="Neosantara Draft-Edit Workflow",
+        description="Drafts a response and edits it paragraph by paragraph as it streams.",
+        steps=[Step(name="draft_and_edit", executor=draft_and_edit, description="Draft and edit a response")],
+        db=db,
+    )
+
+
+class SessionTimings:
+    """Per-operation latency of session reads and writes, kept for the last `window` calls."""
+
+    def __init__(self, slow_ms: float = SESSION_SLOW_MS, window: int = 1000):
+        self.slow_ms = slow_ms
+        self.window = window
+        self._samples: dict = {}  # operation -> deque of durations in ms
+        self._counts: dict = {}  # operation -> total calls
+        self._lock = threading.Lock()
+
+    def wrap(self, db: BaseDb) -> BaseDb:
+        """Time every session method of `db` in place and return it."""
+        for name in SESSION_METHODS:
+            setattr(db, name, self._timed(name, getattr(db, name)))
+        return db
+
+    def _timed(self, name: str, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.record(name, (time.perf_counter() - start) * 1000)
+
+        return timed
+
+    def record(self, name: str, ms: float) -> None:
+        with self._lock:
+            self._samples.setdefault(name, deque(maxlen=self.window)).append(ms)
+            self._counts[name] = self._counts.get(name, 0) + 1
+        if ms >= self.slow_ms:
+            print(f"slow session {name}: {ms:.1f}ms", flush=True)
+
+    def summary(self) -> dict:
+        with self._lock:
+            samples = {name: sorted(values) for name, values in self._samples.items()}
+            counts = dict(self._counts)
+        return {
+            name: {
+                "count": counts[name],
+                "p50_ms": round(values[len(values) // 2], 2),
+                "p95_ms": round(values[int(len(values) * 0.95)], 2),
+                "max_ms": round(values[-1], 2),
+            }
+            for name, values in samples.items()
+        }
+
+
+def build_sqlite_db() -> BaseDb:
+    """SQLite in WAL mode behind a connection pool, safe to share between worker processes."""
+    from agno.db.sqlite import SqliteDb
+    from agno.db.utils import json_serializer
+    from sqlalchemy import create_engine, event
+
+    db_path = os.path.abspath(SESSION_DB_FILE)
+    os.makedirs(os.path.dirname(db_path), exist_ok=True)
+    engine = create_engine(
+        f"sqlite:///{db_path}",
+        json_serializer=json_serializer,
+        pool_size=SESSION_POOL_SIZE,
+        max_overflow=SESSION_POOL_SIZE,
+        connect_args={"timeout": 30, "check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _record):
+        # WAL lets readers proceed during a write; busy_timeout makes concurrent
+        # writers from other workers wait for the lock instead of failing.
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA busy_timeout=5000")
+        cursor.close()
+
+    return SqliteDb(session_table="telegram_sessions", db_engine=engine, db_file=db_path)
+
+
+def build_postgres_db() -> BaseDb:
+    """Postgres (or any Postgres-compatible server) with a pooled psycopg engine."""
+    from agno.db.postgres import PostgresDb
+    from agno.db.postgres.engine import create_postgres_engine
+
+    if not SESSION_DB_URL:
+        raise SystemExit("SESSION_BACKEND=postgres requires SESSION_DB_URL")
+    engine = create_postgres_engine(
+        SESSION_DB_URL, pool_size=SESSION_POOL_SIZE, max_overflow=SESSION_POOL_SIZE
+    )
+    return PostgresDb(session_table="telegram_sessions", db_engine=engine)
+
+
+class MemoryUpdateQueue:
+    """In-process update queue and update_id dedupe, private to one worker process."""
+
+    def __init__(self, max_size: int = QUEUE_MAX_SIZE):
+        self._queue: asyncio.Queue = asyncio.Queue(max_size)
+        self._seen: "OrderedDict[int, float]" = OrderedDict()  # update_id -> first seen
+
+    async def claim(self, update_id: int) -> bool:
+        """True the first time `update_id` is seen within DEDUP_TTL_SECONDS."""
+        now = time.monotonic()
+        while self._seen:
+            oldest_id, seen_at = next(iter(self._seen.items()))
+            if now - seen_at <= DEDUP_TTL_SECONDS:
+                break
+            del self._seen[oldest_id]
+        if update_id in self._seen:
+            return False
+        self._seen[update_id] = now
+        return True
+
+    async def release(self, update_id: int) -> None:
+        self._seen.pop(update_id, None)
+
+    async def put(self, update: dict) -> bool:
+        try:
+            self._queue.put_nowait(update)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def get(self) -> dict:
+        return await self._queue.get()
+
+    async def depth(self) -> int:
+        return self._queue.qsize()
+
+
+class RedisUpdateQueue:
+    """Update queue and update_id dedupe in Redis (or any Redis-compatible server), shared by all workers."""
+
+    def __init__(self, url: str, max_size: int = QUEUE_MAX_SIZE, prefix: str = "telegram"):
+        try:
+            from redis.asyncio import Redis
+        except ImportError as e:
+            raise ImportError("`redis` not installed. WEBHOOK_QUEUE=redis://... requires `pip install redis`") from e
+
+        self._redis = Redis.from_url(url)
+        self.max_size = max_size
+        self._key = f"{prefix}:updates"
+        self._seen_prefix = f"{prefix}:update:"
+
+    async def claim(self, update_id: int) -> bool:
+        return bool(await self._redis.set(f"{self._seen_prefix}{update_id}", 1, nx=True, ex=DEDUP_TTL_SECONDS))
+
+    async def release(self, update_id: int) -> None:
+        await self._redis.delete(f"{self._seen_prefix}{update_id}")
+
+    async def put(self, update: dict) -> bool:
+        if await self._redis.llen(self._key) >= self.max_size:
+            return False
+        await self._redis.lpush(self._key, json.dumps(update))
+        return True
+
+    async def get(self) -> dict:
+        _, raw = await self._redis.brpop(self._key)
+        return json.loads(raw)
+
+    async def depth(self) -> int:
+        return await self._redis.llen(self._key)
+
+
+class QueuedTelegram(Telegram):
+    """Telegram interface whose webhook acks at once and leaves the agent run to a worker pool.
+
+    The public /webhook route only checks the secret token, dedupes by
+    update_id and enqueues the update. `QUEUE_WORKERS` background tasks feed
+    queued updates to agno's own webhook handler, so commands, sessions,
+    streaming and media all behave as with the plain interface. Slow runs no
+    longer hold the webhook open, which is what made Telegram redeliver.
+    """
+
+    def __init__(self, queue, workers: int = QUEUE_WORKERS, **kwargs):
+        super().__init__(**kwargs)
+        self.queue = queue
+        self.workers = workers
+        self._process = None
+        self._ack_ms: deque = deque(maxlen=1000)
+        self.queued = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.processed = 0
+        self.in_flight = 0
+
+    def get_router(self):
+        router = super().get_router()
+        webhook = next(r for r in router.routes if getattr(r, "path", "").endswith("/webhook"))
+        router.routes.remove(webhook)
+        self._process = webhook.endpoint
+        router.add_api_route("/webhook", self.ingest, methods=["POST"], name="telegram_webhook")
+        return router
+
+    async def ingest(self, request: Request) -> dict:
+        start = time.perf_counter()
+        if not validate_webhook_secret_token(request.headers.get("X-Telegram-Bot-Api-Secret-Token")):
+            raise HTTPException(status_code=403, detail="Invalid secret token")
+        update = await request.json()
+        if not (update.get("message") or update.get("edited_message")):
+            return {"status": "ignored"}
+
+        update_id = update.get("update_id")
+        if update_id is not None and not await self.queue.claim(update_id):
+            self.duplicates += 1
+            return {"status": "duplicate"}
+        if not await self.queue.put(update):
+            # Let Telegram's redelivery retry it once the backlog has drained.
+            if update_id is not None:
+                await self.queue.release(update_id)
+            self.rejected += 1
+            raise HTTPException(status_code=503, detail="Queue full")
+
+        self.queued += 1
+        self._ack_ms.append((time.perf_counter() - start) * 1000)
+        return {"status": "queued"}
+
+    async def _work(self) -> None:
+        while True:
+            update = await self.queue.get()
+            self.in_flight += 1
+            try:
+                await self._handle(update)
+            except Exception as exc:  # a failed update must not stop the worker
+                print(f"queued update failed: {exc}", flush=True)
+            finally:
+                self.in_flight -= 1
+                self.processed += 1
+
+    async def _handle(self, update: dict) -> None:
+        # Replay the update through agno's webhook handler, then run the
+        # background task it schedules inline so the worker stays busy until
+        # the reply has been sent.
+        body = json.dumps(update).encode()
+        headers = [(b"content-type", b"application/json")]
+        secret = os.environ.get("TELEGRAM_WEBHOOK_SECRET_TOKEN")
+        if secret:
+            headers.append((b"x-telegram-bot-api-secret-token", secret.encode()))
+
+        async def receive() -> dict:
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        request = Request({"type": "http", "method": "POST", "headers": headers, "query_string": b""}, receive)
+        tasks = BackgroundTasks()
+        await self._process(request, tasks)
+        await tasks()
+
+    @contextlib.asynccontextmanager
+    async def lifespan(self, _app):
+        workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        try:
+            yield
+        finally:
+            for worker in workers:
+                worker.cancel()
+
+    async def metrics(self) -> dict:
+        acks = sorted(self._ack_ms)
+        return {
+            "depth": await self.queue.depth(),
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "processed": self.processed,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "ack_p50_ms": round(acks[len(acks) // 2], 2) if acks else None,
+            "ack_p99_ms": round(acks[int(len(acks) * 0.99)], 2) if acks else None,
+        }
+
+
+def telegram_interface(**kwargs) -> Telegram:
+    """The Telegram interface for this process: queued ingest if WEBHOOK_QUEUE is set, else agno's default."""
+    if not WEBHOOK_QUEUE:
+        return Telegram(**kwargs)
+    queue = MemoryUpdateQueue() if WEBHOOK_QUEUE == "memory" else RedisUpdateQueue(WEBHOOK_QUEUE)
+    return QueuedTelegram(queue, **kwargs)
+
+
+SESSION_BACKENDS = {"sqlite": build_sqlite_db, "postgres": build_postgres_db}
+if SESSION_BACKEND not in SESSION_BACKENDS:
+    raise SystemExit(f"Unknown SESSION_BACKEND {SESSION_BACKEND!r} (expected one of: {', '.join(SESSION_BACKENDS)})")
+
+session_timings = SessionTimings()
+db = session_timings.wrap(SESSION_BACKENDS[SESSION_BACKEND]())
 
 if MODE == "agent":
     entity = build_agent(db)
-    agent_os = AgentOS(agents=[entity], interfaces=[Telegram(agent=entity)])
+    telegram = telegram_interface(agent=entity)
+    entities = {"agents": [entity]}
 elif MODE == "workflow":
     entity = build_workflow(db)
-    agent_os = AgentOS(workflows=[entity], interfaces=[Telegram(workflow=entity)])
-else:  # default: team
+    telegram = telegram_interface(workflow=entity)
+    entities = {"workflows": [entity]}
+elif TEAM_ROUTER:  # default: team, behind the router
+    entity = build_routed_team(db)
+    telegram = telegram_interface(workflow=entity)
+    entities = {"workflows": [entity]}
+else:
     entity = build_team(db)
-    agent_os = AgentOS(teams=[entity], interfaces=[Telegram(team=entity)])
+    telegram = telegram_interface(team=entity)
+    entities = {"teams": [entity]}
+
+queued = isinstance(telegram, QueuedTelegram)
+startup: dict = {}
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app):
+    startup["ready_s"] = round(process_uptime(), 3)
+    print(f"Ready to serve {startup['ready_s']:.2f}s after process start (pid {os.getpid()}).", flush=True)
+    async with telegram.lifespan(app) if queued else contextlib.nullcontext():
+        yield
+
 
+agent_os = AgentOS(**entities, interfaces=[telegram], lifespan=lifespan)
 app = agent_os.get_app()
 
+
+@app.get("/metrics/sessions")
+def session_metrics() -> dict:
+    """Latency of this worker's session reads and writes, per operation."""
+    return {"backend": SESSION_BACKEND, "pid": os.getpid(), "operations": session_timings.summary()}
+
+
+if MODE not in ("agent", "workflow") and TEAM_ROUTER:
+
+    @app.get("/metrics/router")
+    def router_summary() -> dict:
+        """Router decisions, per-route latency and the estimated time and model calls saved."""
+        return {"pid": os.getpid(), **router_metrics.summary()}
+
+
+@app.get("/metrics/startup")
+def startup_metrics() -> dict:
+    """How long this worker took from process start until it could serve requests."""
+    return {"mode": MODE, "pid": os.getpid(), **startup}
+
+
+if queued:
+
+    @app.get("/metrics/queue")
+    async def queue_metrics() -> dict:
+        """Webhook queue depth and this worker's ack latency and throughput counters."""
+        return {"pid": os.getpid(), **(await telegram.metrics())}
+
+
 if __name__ == "__main__":
-    print(f"Starting AgentOS Telegram interface in '{MODE}' mode (model={MODEL_ID})...")
-    agent_os.serve(app="agentos_server:app", host="0.0.0.0", port=PORT)
+    print(
+        f"Starting AgentOS Telegram interface in '{MODE}' mode "
+        f"(model={MODEL_ID}, sessions={SESSION_BACKEND}, workers={WEB_CONCURRENCY})..."
+    )
+    agent_os.serve(app="agentos_server:app", host="0.0.0.0", port=PORT, workers=WEB_CONCURRENCY)
@@ -7,12 +7,13 @@ built on Agno (https://docs.agno.com/tools/toolkits/social/telegram):
 
     Telegram user
         -> getUpdates long-poll (this runtime owns the *receive* side)
-        -> Agno Agent on a Neosantara model
-        -> TelegramTools.send_message (the *send* side)
+        -> Agno Agent on a Neosantara model, streaming its answer
+        -> sendMessage, then editMessageText as more tokens arrive
         -> reply lands back in the user's chat.
 
-Agno's TelegramTools only *sends* messages, so this script adds the receiving
-loop via the Telegram Bot API getUpdates method.
+Replies are streamed straight into the chat rather than going through
+Agno's TelegramTools.send_message tool, which saves a tool-call round trip
+and shows the user the first tokens as soon as the model produces them.
 
 Required env:
     TELEGRAM_TOKEN       Bot token from @BotFather.
@@ -23,18 +24,39 @@ Optional env:
     AGENT_INSTRUCTIONS   System instructions for the agent.
     ALLOWED_CHAT_IDS     Comma-separated chat ids allowed to use the bot.
                          If unset, the bot replies to anyone who messages it.
+    NEOSANTARA_BASE_URL  API base URL (default: https://api.neosantara.xyz/v1),
+                         e.g. a local stand-in server for load tests.
+    MAX_CONCURRENCY      Max agent runs in flight across all chats (default: 64).
+    MAX_PENDING          Max queued messages before the poll loop stops
+                         fetching new updates (default: 1000).
+    COALESCE_WINDOW      Seconds a chat must be quiet before its pending
+                         messages are answered in one run (default: 1.0).
+    CHAT_RATE_LIMIT      Agent runs per minute per chat (default: 10, 0 = off).
+    CHAT_BURST           Runs a chat may make back to back (default: 3).
+    GLOBAL_RATE_LIMIT    Agent runs per minute across all chats
+                         (default: 600, 0 = off).
+    GLOBAL_BURST         Global runs allowed back to back
+                         (default: MAX_CONCURRENCY).
+    TELEGRAM_MAX_RETRIES Retries for a failed Bot API call (default: 5).
+    TELEGRAM_BACKOFF_MAX Cap in seconds for the jittered retry backoff
+                         (default: 30).
+    STREAM_EDIT_INTERVAL Seconds between edits of a streaming reply
+                         (default: 1.0).
+    STREAM_EDIT_CHUNKS   Also edit after this many streamed chunks, whichever
+                         comes first (default: 40).
 """
 
+import asyncio
 import json
 import os
+import random
 import sys
 import time
-import urllib.parse
-import urllib.request
 
+import httpx
 from agno.agent import Agent
 from agno.models.neosantara import Neosantara
-from agno.tools.telegram import TelegramTools
+from agno.run.agent import RunContentEvent
 
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN")
 NEOSANTARA_API_KEY = os.environ.get("NEOSANTARA_API_KEY")
@@ -46,8 +68,21 @@ INSTRUCTIONS = os.environ.get(
 _allowed = os.environ.get("ALLOWED_CHAT_IDS", "").strip()
 ALLOWED_CHAT_IDS = {c.strip() for c in _allowed.split(",") if c.strip()}
 
-API_BASE = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}"
+NEOSANTARA_BASE_URL = os.environ.get("NEOSANTARA_BASE_URL", "https://api.neosantara.xyz/v1")
+MAX_CONCURRENCY = int(os.environ.get("MAX_CONCURRENCY", "64"))
+MAX_PENDING = int(os.environ.get("MAX_PENDING", "1000"))
+COALESCE_WINDOW = float(os.environ.get("COALESCE_WINDOW", "1.0"))
+CHAT_RATE_LIMIT = float(os.environ.get("CHAT_RATE_LIMIT", "10"))
+CHAT_BURST = int(os.environ.get("CHAT_BURST", "3"))
+GLOBAL_RATE_LIMIT = float(os.environ.get("GLOBAL_RATE_LIMIT", "600"))
+GLOBAL_BURST = int(os.environ.get("GLOBAL_BURST", str(MAX_CONCURRENCY)))
+TELEGRAM_MAX_RETRIES = int(os.environ.get("TELEGRAM_MAX_RETRIES", "5"))
+TELEGRAM_BACKOFF_MAX = float(os.environ.get("TELEGRAM_BACKOFF_MAX", "30"))
+STREAM_EDIT_INTERVAL = float(os.environ.get("STREAM_EDIT_INTERVAL", "1.0"))
+STREAM_EDIT_CHUNKS = int(os.environ.get("STREAM_EDIT_CHUNKS", "40"))
+
 POLL_TIMEOUT = 30  # seconds for Telegram long-polling
+TELEGRAM_MAX_MESSAGE = 4096  # characters per message allowed by the Bot API
 
 
 def _require_env() -> None:
@@ -64,55 +99,328 @@ def _require_env() -> None:
         sys.exit(1)
 
 
-def _api(method: str, params: dict) -> dict:
-    """Call a Telegram Bot API method and return the parsed JSON result."""
-    url = f"{API_BASE}/{method}?{urllib.parse.urlencode(params)}"
-    # timeout slightly above POLL_TIMEOUT so long-poll requests aren't cut off.
-    with urllib.request.urlopen(url, timeout=POLL_TIMEOUT + 10) as resp:
-        return json.loads(resp.read().decode("utf-8"))
+def backoff_delay(attempt: int, base: float = 1.0, cap: float = TELEGRAM_BACKOFF_MAX) -> float:
+    """Full-jitter exponential backoff: a random delay in [0, min(cap, base * 2**attempt)]."""
+    return random.uniform(0, min(cap, base * 2 ** min(attempt, 16)))
 
 
-def build_agent(chat_id: str) -> Agent:
-    """Create an Agno agent bound to a specific Telegram chat for replies."""
-    return Agent(
-        name="telegram",
-        model=Neosantara(id=MODEL_ID),
-        tools=[TelegramTools(token=TELEGRAM_TOKEN, chat_id=chat_id)],
-        instructions=INSTRUCTIONS,
-        markdown=False,
-    )
+class TelegramAPI:
+    """Bot API client over one pooled keep-alive HTTP connection.
 
+    Requests are sent as JSON POST bodies. Rate limits (HTTP 429) are retried
+    after the server's `retry_after`; network errors and 5xx responses are
+    retried with jittered exponential backoff, up to `max_retries` times.
+    """
 
-def handle_message(chat_id: str, text: str) -> None:
-    """Run the agent for one incoming message; it replies via TelegramTools."""
-    agent = build_agent(chat_id)
-    # Tell the agent to deliver its answer through the send_message tool so the
-    # reply lands back in the originating Telegram chat.
-    agent.print_response(
-        f"A Telegram user sent: {text!r}. "
-        "Answer them and send the reply to the chat using your Telegram tool."
-    )
+    def __init__(self, token: str, max_retries: int = TELEGRAM_MAX_RETRIES):
+        self.max_retries = max_retries
+        self._client = httpx.AsyncClient(
+            base_url=f"https://api.telegram.org/bot{token}/",
+            limits=httpx.Limits(max_connections=20, max_keepalive_connections=10),
+            # Read timeout slightly above POLL_TIMEOUT so long-poll requests aren't cut off.
+            timeout=httpx.Timeout(POLL_TIMEOUT + 10, connect=10.0),
+        )
 
+    async def call(self, method: str, params: dict) -> dict:
+        """Call a Bot API method and return the parsed JSON result."""
+        attempt = 0
+        while True:
+            try:
+                resp = await self._client.post(method, json=params)
+                data = resp.json()
+            except (httpx.TransportError, json.JSONDecodeError) as exc:
+                if attempt >= self.max_retries:
+                    raise
+                delay = backoff_delay(attempt)
+                print(f"{method} failed ({exc!r}), retrying in {delay:.1f}s", file=sys.stderr, flush=True)
+            else:
+                retry_after = (data.get("parameters") or {}).get("retry_after")
+                if data.get("ok") or attempt >= self.max_retries:
+                    return data
+                if retry_after is not None:
+                    delay = float(retry_after)
+                elif resp.status_code >= 500:
+                    delay = backoff_delay(attempt)
+                else:
+                    return data  # client errors won't succeed on retry
+                print(f"{method} returned {resp.status_code}, retrying in {delay:.1f}s", file=sys.stderr, flush=True)
+            attempt += 1
+            await asyncio.sleep(delay)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+
+_model = None
+
+
+def shared_model() -> Neosantara:
+    """One Neosantara model (and HTTP connection pool) for the whole process."""
+    global _model
+    if _model is None:
+        _model = Neosantara(
+            id=MODEL_ID,
+            base_url=NEOSANTARA_BASE_URL,
+            http_client=httpx.AsyncClient(
+                limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+                timeout=httpx.Timeout(60.0, connect=10.0),
+            ),
+        )
+    return _model
+
+
+_agent = None
+
+
+def shared_agent() -> Agent:
+    """The Agno agent that answers every chat.
+
+    Replies are streamed by this runtime and the agent keeps no per-chat
+    history, so one stateless agent serves all chats concurrently.
+    """
+    global _agent
+    if _agent is None:
+        _agent = Agent(
+            name="telegram",
+            model=shared_model(),
+            instructions=INSTRUCTIONS,
+            markdown=False,
+        )
+    return _agent
+
+
+class StreamingReply:
+    """Streams an answer into a Telegram message that is edited as it grows.
+
+    The first chunk is sent right away with sendMessage; later chunks are
+    folded in with editMessageText at most every `interval` seconds or
+    `every_chunks` chunks. Text past Telegram's message limit continues in a
+    new message.
+    """
+
+    def __init__(
+        self,
+        api: TelegramAPI,
+        chat_id: str,
+        interval: float = STREAM_EDIT_INTERVAL,
+        every_chunks: int = STREAM_EDIT_CHUNKS,
+    ):
+        self.api = api
+        self.chat_id = chat_id
+        self.interval = interval
+        self.every_chunks = every_chunks
+        self._text = ""  # text of the message currently being streamed
+        self._shown = ""  # what the user currently sees in that message
+        self._message_id = None
+        self._chunks = 0  # chunks added since the last edit
+        self._last_edit = 0.0
+
+    async def add(self, delta: str) -> None:
+        self._text += delta
+        self._chunks += 1
+        while len(self._text) > TELEGRAM_MAX_MESSAGE:
+            full, self._text = self._text[:TELEGRAM_MAX_MESSAGE], self._text[TELEGRAM_MAX_MESSAGE:]
+            await self._show(full)
+            self._message_id, self._shown = None, ""
+        if (
+            self._message_id is None
+            or self._chunks >= self.every_chunks
+            or time.monotonic() - self._last_edit >= self.interval
+        ):
+            await self._show(self._text)
+
+    async def finish(self) -> None:
+        await self._show(self._text)
+
+    async def _show(self, text: str) -> None:
+        # Telegram rejects blank messages and edits that change nothing.
+        if not text.strip() or text == self._shown:
+            return
+        if self._message_id is None:
+            data = await self.api.call("sendMessage", {"chat_id": self.chat_id, "text": text})
+        else:
+            data = await self.api.call(
+                "editMessageText",
+                {"chat_id": self.chat_id, "message_id": self._message_id, "text": text},
+            )
+        # On failure nothing changes, so the next chunk retries the same send or edit.
+        if not data.get("ok"):
+            return
+        if self._message_id is None:
+            self._message_id = data["result"]["message_id"]
+        self._shown = text
+        self._chunks = 0
+        self._last_edit = time.monotonic()
 
-def main() -> None:
-    _require_env()
-    print(f"Agno Telegram bot starting (model={MODEL_ID})...", flush=True)
 
+async def handle_message(api: TelegramAPI, chat_id: str, text: str) -> None:
+    """Run the agent for one incoming message, streaming its answer into the chat."""
+    agent = shared_agent()
+    reply = StreamingReply(api, chat_id)
+    started = time.monotonic()
+    first_token = None
+    async for event in agent.arun(text, stream=True):
+        if isinstance(event, RunContentEvent) and event.content:
+            if first_token is None:
+                first_token = time.monotonic() - started
+            await reply.add(str(event.content))
+    await reply.finish()
+    if first_token is not None:
+        print(
+            f"-> [{chat_id}] first token {first_token:.2f}s, done {time.monotonic() - started:.2f}s",
+            flush=True,
+        )
+
+
+class TokenBucket:
+    """Allows `rate` acquisitions per second on average, in bursts of up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class Dispatcher:
+    """Runs different chats in parallel while keeping each chat's messages in order.
+
+    Every chat with pending messages has one worker task. The worker waits
+    until the chat has been quiet for `window` seconds, then answers all of
+    its pending messages with a single agent run; edits to a message that is
+    still pending replace its text instead of triggering another run. Runs are
+    rate-limited by a per-chat and a global token bucket (rates are per
+    minute; 0 disables a limit), and at most `max_concurrency` agent runs are
+    in flight overall. `submit` blocks once `max_pending` messages are queued,
+    which stops the poll loop from fetching more updates until the backlog
+    drains.
+    """
+
+    def __init__(
+        self,
+        api: TelegramAPI,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_pending: int = MAX_PENDING,
+        window: float = COALESCE_WINDOW,
+        chat_rate: float = CHAT_RATE_LIMIT,
+        chat_burst: int = CHAT_BURST,
+        global_rate: float = GLOBAL_RATE_LIMIT,
+        global_burst: int = GLOBAL_BURST,
+    ):
+        self.api = api
+        self.window = window
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._pending = asyncio.Semaphore(max_pending)
+        self._global_bucket = TokenBucket(global_rate / 60, global_burst) if global_rate > 0 else None
+        self._chat_buckets: dict = {}  # chat_id -> TokenBucket
+        self._prune_at = 1024
+        self._messages: dict = {}  # chat_id -> list of [message_id, text] awaiting a run
+        self._last_arrival: dict = {}  # chat_id -> monotonic time of the latest message or edit
+        self._workers: dict = {}  # chat_id -> worker task (keeps it referenced)
+        self.received = 0
+        self.runs = 0
+
+    async def submit(self, chat_id: str, message_id: int, text: str, edited: bool = False) -> None:
+        if edited:
+            for item in self._messages.get(chat_id, ()):
+                if item[0] == message_id:
+                    item[1] = text
+                    self._last_arrival[chat_id] = time.monotonic()
+                    return
+        await self._pending.acquire()
+        self.received += 1
+        self._last_arrival[chat_id] = time.monotonic()
+        messages = self._messages.get(chat_id)
+        if messages is None:
+            messages = self._messages[chat_id] = []
+            self._workers[chat_id] = asyncio.create_task(self._drain(chat_id, messages))
+        messages.append([message_id, text])
+
+    def _chat_bucket(self, chat_id: str):
+        if self.chat_rate <= 0:
+            return None
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self._prune_at:
+                # A full bucket behaves like a fresh one, so idle chats can be forgotten.
+                self._chat_buckets = {
+                    cid: b for cid, b in self._chat_buckets.items() if cid in self._workers or not b.full
+                }
+                self._prune_at = max(1024, 2 * len(self._chat_buckets))
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate / 60, self.chat_burst)
+        return bucket
+
+    async def _drain(self, chat_id: str, messages: list) -> None:
+        while messages:
+            # Debounce: let a burst of short messages (and their edits) settle.
+            while (quiet := time.monotonic() - self._last_arrival[chat_id]) < self.window:
+                await asyncio.sleep(self.window - quiet)
+            for bucket in (self._chat_bucket(chat_id), self._global_bucket):
+                if bucket is not None:
+                    await bucket.acquire()
+            batch = []
+            try:
+                async with self._slots:
+                    # Take the batch only once a slot is free, so messages that
+                    # arrived while waiting are folded into this run too.
+                    batch = messages[:]
+                    messages.clear()
+                    if len(batch) > 1:
+                        print(f"[{chat_id}] coalesced {len(batch)} messages into one run", flush=True)
+                    self.runs += 1
+                    await handle_message(self.api, chat_id, "\n".join(text for _, text in batch))
+            except Exception as exc:  # keep the chat alive on per-message errors
+                print(f"handle_message failed: {exc}", file=sys.stderr, flush=True)
+            finally:
+                for _ in batch:
+                    self._pending.release()
+        # No await between the final check and cleanup, so a concurrent submit
+        # either lands in this batch list or starts a new worker.
+        del self._messages[chat_id]
+        del self._last_arrival[chat_id]
+        del self._workers[chat_id]
+
+
+async def poll(api: TelegramAPI, dispatcher: Dispatcher) -> None:
     offset = None
+    failures = 0
     while True:
         try:
             params = {"timeout": POLL_TIMEOUT}
             if offset is not None:
                 params["offset"] = offset
-            data = _api("getUpdates", params)
+            data = await api.call("getUpdates", params)
 
             if not data.get("ok"):
                 print(f"getUpdates error: {data}", file=sys.stderr, flush=True)
-                time.sleep(3)
+                await asyncio.sleep(backoff_delay(failures))
+                failures += 1
                 continue
+            failures = 0
 
             for update in data.get("result", []):
                 offset = update["update_id"] + 1
+                edited = "edited_message" in update
                 message = update.get("message") or update.get("edited_message")
                 if not message:
                     continue
@@ -128,17 +436,31 @@ def main() -> None:
                     continue
 
                 print(f"<- [{chat_id}] {text}", flush=True)
-                try:
-                    handle_message(chat_id, text)
-                except Exception as exc:  # keep the loop alive on per-message errors
-                    print(f"handle_message failed: {exc}", file=sys.stderr, flush=True)
-
-        except KeyboardInterrupt:
-            print("Shutting down.", flush=True)
-            break
+                await dispatcher.submit(chat_id, message.get("message_id"), text, edited=edited)
+
         except Exception as exc:
             print(f"poll loop error: {exc}", file=sys.stderr, flush=True)
-            time.sleep(3)
+            await asyncio.sleep(backoff_delay(failures))
+            failures += 1
+
+
+async def run() -> None:
+    api = TelegramAPI(TELEGRAM_TOKEN)
+    dispatcher = Dispatcher(api)
+    try:
+        await poll(api, dispatcher)
+    finally:
+        print(f"Received {dispatcher.received} messages, {dispatcher.runs} agent runs.", flush=True)
+        await api.aclose()
+
+
+def main() -> None:
+    _require_env()
+    print(f"Agno Telegram bot starting (model={MODEL_ID})...", flush=True)
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        print("Shutting down.", flush=True)
 
 
 if __name__ == "__main__":
@@ -1,4 +1,11 @@
+import argparse
+import asyncio
+import json
 import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 from crewai import Agent, Task, Crew, Process, LLM
 from dotenv import load_dotenv
 
@@ -12,63 +19,164 @@ api_base = "https://api.neosantara.xyz/v1"
 # The 'openai/' prefix is REQUIRED for OpenAI-compatible endpoints in CrewAI
 model_id = "openai/claude-3-haiku" 
 
+# Optional shared on-disk response cache (see ../shared/llm_cache.py), enabled by
+# LLM_CACHE_PATH. CrewAI's native OpenAI provider builds its own sync and async
+# clients, so with the cache on the LLM is routed through LiteLLM instead, which
+# sends every request through the caching clients installed here.
+llm_cache = None
+if os.getenv("LLM_CACHE_PATH"):
+    import litellm
+
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from shared.llm_cache import LLMCache
+
+    llm_cache = LLMCache.from_env()
+    litellm.client_session = llm_cache.httpx_client()
+    litellm.aclient_session = llm_cache.async_httpx_client()
+
 # Initialize the LLM
 llm = LLM(
     model=model_id,
     api_key=api_key,
-    base_url=api_base
+    base_url=api_base,
+    is_litellm=llm_cache is not None
 )
 
-# Define Agents
-researcher = Agent(
-    role='Tech Researcher',
-    goal='Identify emerging trends in Indonesian AI landscape',
-    backstory='You are an expert tech journalist specializing in Southeast Asian technology.',
-    llm=llm,
-    verbose=True
-)
+# Batch runs (see run_batch) keep this many crews in flight at once. Every crew
+# shares the one `llm` above and its pooled HTTP client.
+CREW_CONCURRENCY = int(os.getenv("CREW_CONCURRENCY", "8"))
+DEFAULT_TOPIC = "AI development in Indonesia"
 
-writer = Agent(
-    role='Content Strategist',
-    goal='Write a compelling blog post about AI in Indonesia',
-    backstory='You are a skilled writer who can explain complex tech topics to a general audience.',
-    llm=llm,
-    verbose=True
-)
+def build_crew(verbose=True):
+    """Assemble a fresh researcher/writer crew. `{topic}` in the agent and task
+    text is filled in from the kickoff inputs."""
+    # Define Agents
+    researcher = Agent(
+        role='Tech Researcher',
+        goal='Identify emerging trends in {topic}',
+        backstory='You are an expert tech journalist specializing in Southeast Asian technology.',
+        llm=llm,
+        verbose=verbose
+    )
 
-# Define Tasks
-task_research = Task(
-    description='Research the current state of AI development in Indonesia for 2026.',
-    expected_output='A summary of 3 key trends or major projects.',
-    agent=researcher
-)
+    writer = Agent(
+        role='Content Strategist',
+        goal='Write a compelling blog post about {topic}',
+        backstory='You are a skilled writer who can explain complex tech topics to a general audience.',
+        llm=llm,
+        verbose=verbose
+    )
 
-task_write = Task(
-    description='Based on the research, write a 2-paragraph blog post about Indonesia\'s AI future.',
-    expected_output='A 2-paragraph blog post in English.',
-    agent=writer
-)
+    # Define Tasks
+    task_research = Task(
+        description='Research the current state of {topic} for 2026.',
+        expected_output='A summary of 3 key trends or major projects.',
+        agent=researcher
+    )
 
-# Assemble the Crew
-crew = Crew(
-    agents=[researcher, writer],
-    tasks=[task_research, task_write],
-    process=Process.sequential,
-    verbose=True
-)
+    task_write = Task(
+        description='Based on the research, write a 2-paragraph blog post about the future of {topic}.',
+        expected_output='A 2-paragraph blog post in English.',
+        agent=writer
+    )
+
+    # Assemble the Crew
+    return Crew(
+        agents=[researcher, writer],
+        tasks=[task_research, task_write],
+        process=Process.sequential,
+        verbose=verbose
+    )
+
+def finished_topics(output_path):
+    """Topics that already have a successful result in `output_path`."""
+    path = Path(output_path)
+    if not path.exists():
+        return set()
+    done = set()
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:  # a line cut short by an interrupted run
+                continue
+            if "error" not in record:
+                done.add(record.get("topic"))
+    return done
+
+async def run_batch(topics, output_path, concurrency=CREW_CONCURRENCY):
+    """Run one crew per topic, at most `concurrency` at a time.
+
+    Crews keep state while they run, so each topic gets its own. Each result is
+    appended to `output_path` as a JSON line as soon as its crew finishes, so a
+    long batch can be watched while it runs. Topics that already have a
+    successful result in `output_path` are skipped, so an interrupted batch is
+    resumed by running it again; failed topics are retried.
+    """
+    done_before = finished_topics(output_path)
+    if done_before:
+        skipped = len(topics)
+        topics = [t for t in topics if t not in done_before]
+        print(f"Skipping {skipped - len(topics)} topics already in {output_path}", flush=True)
+    if not topics:
+        return
+
+    # kickoff_async runs the blocking kickoff in the default executor, which
+    # only has min(32, cpus + 4) threads; size it to the concurrency limit.
+    asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=concurrency))
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_topic(topic):
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                result = await build_crew(verbose=False).kickoff_async(inputs={"topic": topic})
+                return {"topic": topic, "result": str(result), "seconds": round(time.perf_counter() - start, 2)}
+            except Exception as e:
+                return {"topic": topic, "error": f"{type(e).__name__}: {e}", "seconds": round(time.perf_counter() - start, 2)}
+
+    start = time.perf_counter()
+    failed = 0
+    with open(output_path, "a", encoding="utf-8") as output:
+        for done, finished in enumerate(asyncio.as_completed([run_topic(t) for t in topics]), 1):
+            record = await finished
+            failed += "error" in record
+            output.write(json.dumps(record, ensure_ascii=False) + "\n")
+            output.flush()
+            status = record.get("error") or f"{record['seconds']:.1f}s"
+            print(f"[{done}/{len(topics)}] {record['topic']}: {status}", flush=True)
+
+    elapsed = time.perf_counter() - start
+    print(
+        f"Finished {len(topics) - failed}/{len(topics)} topics in {elapsed:.1f}s "
+        f"({len(topics) / elapsed * 60:.1f} topics/min, concurrency={concurrency}) -> {output_path}"
+    )
 
 # Start the work
 def main():
+    parser = argparse.ArgumentParser(description="Run the research/writing crew for one or many topics.")
+    parser.add_argument("--topics", help="text file with one topic per line; runs the crew for each")
+    parser.add_argument("--output", default="results.jsonl", help="JSONL file that batch results are appended to")
+    parser.add_argument("--concurrency", type=int, default=CREW_CONCURRENCY, help="crews in flight at once")
+    args = parser.parse_args()
+
     if not api_key:
         print("Please set NEOSANTARA_API_KEY in your .env file.")
         return
 
-    print("### Starting CrewAI with Neosantara AI ###")
-    result = crew.kickoff()
-    print("\n\n########################")
-    print("## FINAL RESULT ##")
-    print("########################\n")
-    print(result)
+    if args.topics:
+        topics = [line.strip() for line in Path(args.topics).read_text(encoding="utf-8").splitlines() if line.strip()]
+        print(f"### Running {len(topics)} crews with Neosantara AI ###")
+        asyncio.run(run_batch(topics, args.output, args.concurrency))
+    else:
+        print("### Starting CrewAI with Neosantara AI ###")
+        result = build_crew().kickoff(inputs={"topic": DEFAULT_TOPIC})
+        print("\n\n########################")
+        print("## FINAL RESULT ##")
+        print("########################\n")
+        print(result)
+    if llm_cache:
+        print(llm_cache.summary())
 
 if __name__ == "__main__":
     main()
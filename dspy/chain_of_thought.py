@@ -1,5 +1,8 @@
 import dspy
 import os
+import sys
+import time
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -10,11 +13,32 @@ api_key = os.getenv("NEOSANTARA_API_KEY")
 api_base = "https://api.neosantara.xyz/v1"
 model = "claude-3-haiku"
 
+# Optional shared on-disk response cache (see ../shared/llm_cache.py), enabled by
+# LLM_CACHE_PATH. The cache sits on LiteLLM's HTTP client, so the LM below is
+# built with engine="litellm" instead of DSPy's default native engine.
+llm_cache = None
+if os.getenv("LLM_CACHE_PATH"):
+    import litellm
+
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from shared.llm_cache import LLMCache
+
+    llm_cache = LLMCache.from_env()
+    litellm.client_session = llm_cache.httpx_client()
+
 # Define the language model
 # In DSPy 3.x, use dspy.LM with the provider/model format
-lm = dspy.LM(f"openai/{model}", api_key=api_key, api_base=api_base)
+lm = dspy.LM(
+    f"openai/{model}",
+    api_key=api_key,
+    api_base=api_base,
+    **({"engine": "litellm"} if llm_cache else {}),
+)
 dspy.settings.configure(lm=lm)
 
+# Few-shot state written by `python optimize.py math ...`; main() loads it when present.
+COMPILED_PATH = Path(__file__).resolve().parent / "compiled" / "math.json"
+
 # Define a Signature for complex reasoning
 class MathReasoning(dspy.Signature):
     """Solve math word problems with step-by-step reasoning."""
@@ -37,6 +61,10 @@ def main():
         return
 
     solver = MathSolver()
+    if COMPILED_PATH.exists():
+        start = time.perf_counter()
+        solver.load(str(COMPILED_PATH))
+        print(f"Loaded compiled program from {COMPILED_PATH.name} in {(time.perf_counter() - start) * 1000:.1f} ms")
     problem = "If I have 5 apples and buy 3 more, then give half to my friend, how many do I have left?"
     response = solver.forward(problem=problem)
     
@@ -44,5 +72,8 @@ def main():
     print(f"Reasoning: {response.reasoning}")
     print(f"Answer: {response.answer}")
 
+    if llm_cache:
+        print(llm_cache.summary())
+
 if __name__ == "__main__":
     main()
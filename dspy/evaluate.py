@@ -0,0 +1,238 @@
+"""Batched, parallel evaluation runner for the DSPy examples.
+
+Runs `QABot` (simple_qa.py), `MathSolver` (chain_of_thought.py) or `ToolAgent`
+(react_agent.py) over a JSONL or CSV dataset on a thread pool and reports
+accuracy, latency percentiles and token throughput:
+
+    python evaluate.py qa data/qa_sample.jsonl --concurrency 16
+    python evaluate.py math data/math_sample.csv --model llama-3.3-70b-instruct
+
+Every row needs the program's input field (`question`, or `problem` for math)
+and an `answer` column. Each LM call gets its own timeout and is retried with
+exponential backoff on transient errors; examples that still fail are counted
+as errors (and as wrong) instead of stopping the run.
+
+DSPy's own response cache is off by default so latencies are real; pass
+`--cache` to re-use it. `EVAL_CONCURRENCY` sets the default thread count.
+"""
+import argparse
+import csv
+import importlib
+import json
+import os
+import re
+import string
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+
+import dspy
+
+# name -> (example module, program class, input field)
+PROGRAMS = {
+    "qa": ("simple_qa", "QABot", "question"),
+    "math": ("chain_of_thought", "MathSolver", "problem"),
+    "react": ("react_agent", "ToolAgent", "question"),
+}
+
+EVAL_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "8"))
+
+NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+ARTICLES = re.compile(r"\b(a|an|the)\b")
+PUNCTUATION = str.maketrans("", "", string.punctuation)
+
+
+def load_dataset(path, limit=None):
+    """Read examples from a .jsonl or .csv file as a list of dicts."""
+    path = Path(path)
+    with path.open(newline="", encoding="utf-8") as f:
+        if path.suffix == ".csv":
+            rows = list(csv.DictReader(f))
+        elif path.suffix in (".jsonl", ".ndjson"):
+            rows = [json.loads(line) for line in f if line.strip()]
+        else:
+            raise ValueError(f"Unsupported dataset format '{path.suffix}', use .jsonl or .csv")
+    return rows[:limit] if limit else rows
+
+
+def normalize(text):
+    text = ARTICLES.sub(" ", str(text).lower().translate(PUNCTUATION))
+    return " ".join(text.split())
+
+
+def answer_match(expected, predicted):
+    """Numeric answers must equal the last number in the prediction; text
+    answers must appear in it as whole words after normalization."""
+    expected, predicted = str(expected).strip(), str(predicted or "")
+    if NUMBER.fullmatch(expected.replace(",", "")):
+        numbers = NUMBER.findall(re.sub(r"(?<=\d),(?=\d)", "", predicted))
+        return bool(numbers) and float(numbers[-1]) == float(expected.replace(",", ""))
+    exp, pred = normalize(expected), normalize(predicted)
+    return bool(exp) and f" {exp} " in f" {pred} "
+
+
+def percentile(values, p):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def count_tokens(usage):
+    """Sum prompt/completion tokens over every LM in a get_lm_usage() dict."""
+    prompt = completion = 0
+    for entry in (usage or {}).values():
+        prompt += entry.get("prompt_tokens") or 0
+        completion += entry.get("completion_tokens") or 0
+    return prompt, completion
+
+
+def run_example(program, lm, field, index, row):
+    record = {"index": index, "input": row.get(field), "expected": row.get("answer")}
+    start = time.perf_counter()
+    try:
+        with dspy.context(lm=lm, track_usage=True):
+            prediction = program(**{field: row[field]})
+        record["predicted"] = prediction.answer
+        record["prompt_tokens"], record["completion_tokens"] = count_tokens(prediction.get_lm_usage())
+        record["correct"] = answer_match(record["expected"], prediction.answer)
+        if prediction.get("steps") is not None:
+            record["steps"] = len(prediction.steps)
+            record["stop_reason"] = prediction.stop_reason
+    except Exception as e:
+        record.update(predicted=None, prompt_tokens=0, completion_tokens=0, correct=False)
+        record["error"] = f"{type(e).__name__}: {e}"
+    record["latency_s"] = round(time.perf_counter() - start, 4)
+    return record
+
+
+def evaluate(program, lm, field, rows, concurrency=EVAL_CONCURRENCY, output=None):
+    """Run `program` over `rows` with `concurrency` worker threads.
+
+    Records are written to `output` (JSONL) as each example finishes and are
+    returned in dataset order.
+    """
+    missing = [i for i, row in enumerate(rows) if field not in row or "answer" not in row]
+    if missing:
+        raise ValueError(f"Rows {missing[:5]} are missing the '{field}' or 'answer' column")
+
+    records = [None] * len(rows)
+    done = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = [pool.submit(run_example, program, lm, field, i, row) for i, row in enumerate(rows)]
+        for future in as_completed(futures):
+            record = future.result()
+            records[record["index"]] = record
+            done += 1
+            if output:
+                output.write(json.dumps(record, ensure_ascii=False) + "\n")
+                output.flush()
+            if record.get("error"):
+                print(f"[{done}/{len(rows)}] example {record['index']} failed: {record['error']}", flush=True)
+            elif done % 50 == 0 or done == len(rows):
+                print(f"[{done}/{len(rows)}] examples done", flush=True)
+    return records
+
+
+def report(records, wall_s):
+    """Accuracy, latency percentiles and token throughput for a finished run."""
+    n = len(records)
+    ok = [r for r in records if not r.get("error")]
+    correct = sum(r["correct"] for r in records)
+    latencies = sorted(r["latency_s"] for r in ok)
+    prompt = sum(r["prompt_tokens"] for r in records)
+    completion = sum(r["completion_tokens"] for r in records)
+    return {
+        "examples": n,
+        "correct": correct,
+        "errors": n - len(ok),
+        "accuracy": correct / n if n else 0.0,
+        "latency_s": {f"p{p}": percentile(latencies, p) for p in (50, 90, 95, 99)}
+        | {"max": latencies[-1] if latencies else 0.0},
+        "wall_s": wall_s,
+        "examples_per_s": n / wall_s if wall_s else 0.0,
+        "prompt_tokens": prompt,
+        "completion_tokens": completion,
+        "tokens_per_s": (prompt + completion) / wall_s if wall_s else 0.0,
+        "completion_tokens_per_s": completion / wall_s if wall_s else 0.0,
+    }
+
+
+def print_report(name, model, concurrency, summary):
+    lat = summary["latency_s"]
+    print(f"\n{name} on {model} (concurrency={concurrency})")
+    print(
+        f"  accuracy:   {summary['accuracy']:.1%} ({summary['correct']}/{summary['examples']}), "
+        f"{summary['errors']} errors"
+    )
+    print(
+        f"  latency:    p50 {lat['p50']:.2f}s  p90 {lat['p90']:.2f}s  p95 {lat['p95']:.2f}s  "
+        f"p99 {lat['p99']:.2f}s  max {lat['max']:.2f}s"
+    )
+    print(
+        f"  throughput: {summary['examples_per_s']:.2f} examples/s, {summary['tokens_per_s']:.0f} tokens/s "
+        f"({summary['completion_tokens_per_s']:.0f} completion tokens/s) over {summary['wall_s']:.2f}s"
+    )
+    print(f"  tokens:     {summary['prompt_tokens']} prompt + {summary['completion_tokens']} completion")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate a DSPy example program over a dataset.")
+    parser.add_argument("program", choices=sorted(PROGRAMS))
+    parser.add_argument("dataset", help="JSONL or CSV file with an input column and an 'answer' column")
+    parser.add_argument("--model", help="Neosantara model to evaluate (default: the example's model)")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY, help="worker threads")
+    parser.add_argument("--timeout", type=float, default=60.0, help="per-LM-call timeout in seconds")
+    parser.add_argument("--retries", type=int, default=3, help="retries per LM call on transient errors")
+    parser.add_argument("--limit", type=int, help="only evaluate the first N examples")
+    parser.add_argument("--output", help="write per-example results to this JSONL file as they finish")
+    parser.add_argument("--report", help="write the summary to this JSON file")
+    parser.add_argument("--compiled", help="load program state saved by optimize.py before evaluating")
+    parser.add_argument("--cache", action="store_true", help="re-use DSPy's response cache")
+    args = parser.parse_args()
+
+    module_name, class_name, field = PROGRAMS[args.program]
+    example = importlib.import_module(module_name)
+    if not example.api_key:
+        print("Please set NEOSANTARA_API_KEY in your .env file.")
+        return
+
+    lm = example.lm.copy(
+        cache=args.cache,
+        num_retries=args.retries,
+        timeout=args.timeout,
+        **({"model": f"openai/{args.model}"} if args.model else {}),
+    )
+    program = getattr(example, class_name)()
+    if args.compiled:
+        program.load(args.compiled)
+    rows = load_dataset(args.dataset, args.limit)
+    print(f"Evaluating {class_name} on {len(rows)} examples from {args.dataset} with {lm.model}", flush=True)
+
+    output = open(args.output, "w", encoding="utf-8") if args.output else None
+    try:
+        start = time.perf_counter()
+        records = evaluate(program, lm, field, rows, args.concurrency, output)
+        summary = report(records, time.perf_counter() - start)
+    finally:
+        if output:
+            output.close()
+
+    print_report(class_name, lm.model, args.concurrency, summary)
+    if hasattr(example, "react_stats"):
+        summary["react"] = react = example.react_stats.summary()
+        print(
+            f"  react:      {react['mean_steps']:.2f} steps/question {react['steps_per_question']}, "
+            f"stops {react['stop_reasons']}, {react['tokens_per_step']:.0f} tokens/step, "
+            f"llm p50 {react['llm_s']['p50']:.2f}s, tool p50 {react['tool_s']['p50'] * 1000:.1f}ms"
+        )
+    if args.report:
+        summary.update(program=args.program, model=lm.model, concurrency=args.concurrency, dataset=args.dataset)
+        Path(args.report).write_text(json.dumps(summary, indent=2))
+
+    if example.llm_cache:
+        print(example.llm_cache.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,204 @@
+"""Local BM25 search over a document corpus for the ReAct agent's search tool.
+
+The corpus is a JSONL file with one `{"title": ..., "text": ...}` object per
+line. `KnowledgeBase` builds an inverted index over it once, then answers
+queries with BM25 ranking. Query terms that are not in the vocabulary fall back
+to prefix matches ("neosant" -> "neosantara") and then to terms one edit away
+("jakrta" -> "jakarta"), so differently phrased or misspelled queries still
+hit. Results are memoized per normalized query.
+
+Building the index is the slow part (seconds for 100k documents), so
+`from_jsonl` can pickle it next to the corpus and reload it on later runs. The
+pickle records a hash of the corpus and the ranking parameters it was built
+with, and is rebuilt when either changes.
+
+Each term's postings store precomputed BM25 weights in compact arrays, so a
+lookup only sums floats. Very common terms keep only their `MAX_POSTINGS`
+highest-weighted documents (a champion list): they add little to the ranking
+and would otherwise make every query that contains them scan most of the corpus.
+"""
+import hashlib
+import json
+import math
+import pickle
+import re
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from functools import lru_cache
+from heapq import nlargest
+from pathlib import Path
+
+TOKEN = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has in is it of on or that the this to was were what when where which who "
+    "why how with about tell me does do".split()
+)
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Title terms are counted this many times, so a query naming a document's
+# subject ranks that document above ones that only mention it.
+TITLE_WEIGHT = 3
+MAX_PREFIX_TERMS = 20
+MAX_POSTINGS = 1000
+K1 = 1.5
+B = 0.75
+# A top hit scoring this many times the runner-up counts as a confident answer,
+# provided its BM25 score is at least CONFIDENT_MIN_SCORE; weaker hits (say, a
+# lone document that mentions one query term in passing) never do.
+CONFIDENT_MARGIN = 2.0
+CONFIDENT_MIN_SCORE = 3.0
+
+
+def tokenize(text):
+    return [t for t in TOKEN.findall(text.lower()) if t not in STOPWORDS]
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def index_params(k1=K1, b=B):
+    """Everything besides the corpus that changes what the index contains."""
+    return {"k1": k1, "b": b, "title_weight": TITLE_WEIGHT, "max_postings": MAX_POSTINGS}
+
+
+def edits1(term):
+    """Every string one delete, transpose, replace or insert away from `term`."""
+    splits = [(term[:i], term[i:]) for i in range(len(term) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class KnowledgeBase:
+    """BM25 inverted index over (title, text) documents."""
+
+    def __init__(self, documents, k1=K1, b=B, cache_size=4096):
+        self.titles = []
+        self.texts = []
+        self.by_title = {}
+        doc_ids = defaultdict(lambda: array("I"))  # term -> documents containing it
+        frequencies = defaultdict(lambda: array("H"))  # term -> term frequency in each of them
+        lengths = []
+        for doc_id, (title, text) in enumerate(documents):
+            self.titles.append(title)
+            self.texts.append(text)
+            title_terms = tokenize(title)
+            self.by_title.setdefault(" ".join(title_terms), doc_id)
+            counts = Counter(tokenize(text))
+            for term in title_terms:
+                counts[term] += TITLE_WEIGHT
+            for term, tf in counts.items():
+                doc_ids[term].append(doc_id)
+                frequencies[term].append(min(tf, 65535))
+            lengths.append(sum(counts.values()))
+
+        n = len(lengths)
+        avg_length = sum(lengths) / n if n else 1.0
+        norm = [k1 * (1 - b + b * length / avg_length) for length in lengths]
+        self.postings = {}  # term -> (doc ids, BM25 weights)
+        for term, ids in doc_ids.items():
+            idf = math.log(1 + (n - len(ids) + 0.5) / (len(ids) + 0.5))
+            weights = array("f", [idf * tf * (k1 + 1) / (tf + norm[d]) for d, tf in zip(ids, frequencies[term])])
+            if len(ids) > MAX_POSTINGS:
+                top = nlargest(MAX_POSTINGS, range(len(ids)), key=weights.__getitem__)
+                ids, weights = array("I", [ids[i] for i in top]), array("f", [weights[i] for i in top])
+            self.postings[term] = (ids, weights)
+        self.vocabulary = sorted(self.postings)
+        self.cache_size = cache_size
+        self._ranked = lru_cache(maxsize=cache_size)(self._rank)
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_ranked"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._ranked = lru_cache(maxsize=self.cache_size)(self._rank)
+
+    @classmethod
+    def from_jsonl(cls, path, index_path=None, k1=K1, b=B, **kwargs):
+        """Build an index over a JSONL corpus, or load the pickled one at
+        `index_path` if it was built from the same corpus contents with the same
+        parameters (writing it otherwise)."""
+        path = Path(path)
+        if index_path:
+            index_path = Path(index_path)
+            fingerprint = {"corpus_sha256": file_hash(path), **index_params(k1, b)}
+            if index_path.exists():
+                with index_path.open("rb") as f:
+                    # The fingerprint is pickled first, so a stale index is not loaded.
+                    if pickle.load(f) == fingerprint:
+                        return pickle.load(f)
+
+        def documents():
+            with path.open(encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        doc = json.loads(line)
+                        yield doc["title"], doc["text"]
+
+        index = cls(documents(), k1=k1, b=b, **kwargs)
+        if index_path:
+            with index_path.open("wb") as f:
+                pickle.dump(fingerprint, f, protocol=pickle.HIGHEST_PROTOCOL)
+                pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+        return index
+
+    def __len__(self):
+        return len(self.titles)
+
+    def expand(self, term):
+        """Map a query term to index terms: itself, its prefix matches, or its
+        one-edit neighbours, in that order of preference."""
+        if term in self.postings:
+            return [term]
+        start = bisect_left(self.vocabulary, term)
+        prefixed = []
+        for candidate in self.vocabulary[start : start + MAX_PREFIX_TERMS]:
+            if not candidate.startswith(term):
+                break
+            prefixed.append(candidate)
+        if prefixed or len(term) < 4:
+            return prefixed
+        return [candidate for candidate in edits1(term) if candidate in self.postings]
+
+    def search(self, query, k=3):
+        """Return up to `k` (score, title, text) tuples, best first."""
+        return self._ranked(" ".join(tokenize(query)), k)
+
+    def confident(self, query, margin=CONFIDENT_MARGIN, min_score=CONFIDENT_MIN_SCORE):
+        """True when the top hit for `query` is the document with that exact
+        title, or scores at least `min_score` and outscores the runner-up (if
+        any) by `margin` times."""
+        normalized_query = " ".join(tokenize(query))
+        results = self._ranked(normalized_query, 2)
+        if not results:
+            return False
+        if normalized_query in self.by_title:
+            return True
+        if results[0][0] < min_score:
+            return False
+        return len(results) == 1 or results[0][0] >= margin * results[1][0]
+
+    def _rank(self, normalized_query, k):
+        terms = normalized_query.split()
+        exact = self.by_title.get(normalized_query)
+        scores = defaultdict(float)
+        for term in terms:
+            for index_term in self.expand(term):
+                doc_ids, weights = self.postings[index_term]
+                for doc_id, weight in zip(doc_ids, weights):
+                    scores[doc_id] += weight
+        if exact is not None:
+            scores[exact] += max(scores.values(), default=0.0) + 1.0
+        best = nlargest(k, scores.items(), key=lambda item: item[1])
+        return tuple((score, self.titles[doc_id], self.texts[doc_id]) for doc_id, score in best)
@@ -0,0 +1,101 @@
+"""Compile a DSPy example program with BootstrapFewShot and save it to disk.
+
+A stronger teacher model runs the program over the training rows, and the
+traces it gets right become few-shot demos for the cheaper student model (the
+example's own `claude-3-haiku` by default). The compiled state is saved to
+`compiled/<program>.json`, which `simple_qa.py`, `chain_of_thought.py` and
+`react_agent.py` load on startup when present:
+
+    python optimize.py math data/math_sample.csv --teacher deepseek-chat-v3.1
+
+The last `--dev-size` rows are held out and scored with the uncompiled student,
+the teacher and the compiled student, so the report shows whether the demos
+close the gap and what each query costs in tokens.
+"""
+import argparse
+import importlib
+import time
+from pathlib import Path
+
+import dspy
+from dspy.teleprompt import BootstrapFewShot
+
+from evaluate import EVAL_CONCURRENCY, PROGRAMS, answer_match, evaluate, load_dataset, report
+
+COMPILED_DIR = Path(__file__).resolve().parent / "compiled"
+
+
+def metric(example, prediction, trace=None):
+    return answer_match(example.answer, prediction.answer)
+
+
+def score(label, program, lm, field, rows, concurrency):
+    start = time.perf_counter()
+    summary = report(evaluate(program, lm, field, rows, concurrency), time.perf_counter() - start)
+    n = summary["examples"] or 1
+    print(
+        f"  {label:<30} accuracy {summary['accuracy']:6.1%}  "
+        f"{(summary['prompt_tokens'] + summary['completion_tokens']) / n:7.0f} tokens/query  "
+        f"p50 {summary['latency_s']['p50']:.2f}s",
+        flush=True,
+    )
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile a DSPy example program with BootstrapFewShot.")
+    parser.add_argument("program", choices=sorted(PROGRAMS))
+    parser.add_argument("dataset", help="JSONL or CSV training data with an input column and an 'answer' column")
+    parser.add_argument("--teacher", help="Neosantara model that bootstraps the demos (default: the student)")
+    parser.add_argument("--model", help="student model to compile for (default: the example's model)")
+    parser.add_argument("--dev-size", type=int, default=0, help="hold out the last N rows for before/after scoring")
+    parser.add_argument("--demos", type=int, default=4, help="maximum bootstrapped demos per predictor")
+    parser.add_argument("--concurrency", type=int, default=EVAL_CONCURRENCY, help="worker threads for scoring")
+    parser.add_argument("--out", help="where to save the compiled program (default: compiled/<program>.json)")
+    args = parser.parse_args()
+
+    module_name, class_name, field = PROGRAMS[args.program]
+    example = importlib.import_module(module_name)
+    if not example.api_key:
+        print("Please set NEOSANTARA_API_KEY in your .env file.")
+        return
+
+    student_lm = example.lm.copy(**({"model": f"openai/{args.model}"} if args.model else {}))
+    teacher_lm = example.lm.copy(model=f"openai/{args.teacher}") if args.teacher else student_lm
+    program_cls = getattr(example, class_name)
+
+    rows = load_dataset(args.dataset)
+    train_rows, dev_rows = (rows[: -args.dev_size], rows[-args.dev_size :]) if args.dev_size else (rows, [])
+    trainset = [dspy.Example(**row).with_inputs(field) for row in train_rows]
+
+    print(f"Compiling {class_name} for {student_lm.model} with demos from {teacher_lm.model} ({len(trainset)} rows)")
+    optimizer = BootstrapFewShot(
+        metric=metric,
+        max_bootstrapped_demos=args.demos,
+        max_labeled_demos=args.demos,
+        teacher_settings={"lm": teacher_lm},
+    )
+    start = time.perf_counter()
+    with dspy.context(lm=student_lm):
+        compiled = optimizer.compile(program_cls(), trainset=trainset)
+    print(f"Compiled in {time.perf_counter() - start:.1f}s")
+
+    out = Path(args.out) if args.out else COMPILED_DIR / f"{args.program}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    compiled.save(str(out))
+    print(f"Saved compiled program to {out}")
+
+    if dev_rows:
+        print(f"\nHeld-out scores on {len(dev_rows)} rows:")
+        fresh = student_lm.copy(cache=False)
+        score(f"student {args.model or example.model}", program_cls(), fresh, field, dev_rows, args.concurrency)
+        if teacher_lm is not student_lm:
+            score(f"teacher {args.teacher}", program_cls(), teacher_lm.copy(cache=False), field, dev_rows, args.concurrency)
+        score("compiled student", compiled, fresh, field, dev_rows, args.concurrency)
+
+    if example.llm_cache:
+        print(example.llm_cache.summary())
+
+
+if __name__ == "__main__":
+    main()
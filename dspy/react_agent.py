@@ -1,6 +1,20 @@
 import dspy
+import json
 import os
+import sys
+import threading
+import time
+from collections import Counter
+from pathlib import Path
 from dotenv import load_dotenv
+from dspy.utils.usage_tracker import track_usage
+
+try:
+    from dspy.utils.exceptions import ContextWindowExceededError
+except ImportError:  # older DSPy 3.x releases re-raise LiteLLM's error
+    from litellm import ContextWindowExceededError
+
+from knowledge_base import KnowledgeBase
 
 # Load environment variables
 load_dotenv()
@@ -10,21 +24,57 @@ api_key = os.getenv("NEOSANTARA_API_KEY")
 api_base = "https://api.neosantara.xyz/v1"
 model = "claude-3-haiku"
 
+# Optional shared on-disk response cache (see ../shared/llm_cache.py), enabled by
+# LLM_CACHE_PATH. The cache sits on LiteLLM's HTTP client, so the LM below is
+# built with engine="litellm" instead of DSPy's default native engine.
+llm_cache = None
+if os.getenv("LLM_CACHE_PATH"):
+    import litellm
+
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from shared.llm_cache import LLMCache
+
+    llm_cache = LLMCache.from_env()
+    litellm.client_session = llm_cache.httpx_client()
+
 # Define the language model (DSPy 3.x syntax)
-lm = dspy.LM(f"openai/{model}", api_key=api_key, api_base=api_base)
+lm = dspy.LM(
+    f"openai/{model}",
+    api_key=api_key,
+    api_base=api_base,
+    **({"engine": "litellm"} if llm_cache else {}),
+)
 dspy.settings.configure(lm=lm)
 
-# Define a simple search tool (Mock)
+# Local knowledge base (see knowledge_base.py): a BM25 index over a JSONL corpus
+# of {"title", "text"} documents. Set KNOWLEDGE_BASE_INDEX to pickle the built
+# index so large corpora are only indexed once.
+KNOWLEDGE_BASE_PATH = os.getenv(
+    "KNOWLEDGE_BASE_PATH", str(Path(__file__).resolve().parent / "data" / "wiki_sample.jsonl")
+)
+KNOWLEDGE_BASE_INDEX = os.getenv("KNOWLEDGE_BASE_INDEX")
+SEARCH_RESULTS = int(os.getenv("SEARCH_RESULTS", "3"))
+
+# ReAct loop controls. Every iteration is a full LLM call, so the budget caps the
+# cost of a question; early exit skips the final "finish" turn when a search
+# already returned a confident answer. REACT_STATS_PATH exports the per-step
+# statistics (including the steps-per-question histogram) as JSON.
+REACT_MAX_ITERS = int(os.getenv("REACT_MAX_ITERS", "6"))
+REACT_EARLY_EXIT = os.getenv("REACT_EARLY_EXIT", "true").lower() in ("1", "true", "yes")
+REACT_STATS_PATH = os.getenv("REACT_STATS_PATH")
+
+# Few-shot state written by `python optimize.py react ...`; main() loads it when present.
+COMPILED_PATH = Path(__file__).resolve().parent / "compiled" / "react.json"
+
+knowledge_base = KnowledgeBase.from_jsonl(KNOWLEDGE_BASE_PATH, index_path=KNOWLEDGE_BASE_INDEX)
+
 def search_wikipedia(query: str) -> str:
     """Search Wikipedia for information."""
-    # In a real app, this would call an API
-    knowledge_base = {
-        "Neosantara AI": "Neosantara AI is a unified LLM gateway from Indonesia that supports multiple providers like OpenAI, Anthropic, and Google.",
-        "DSPy": "DSPy is a framework for programming with language models, developed by Stanford NLP.",
-        "Jakarta": "Jakarta is the capital and largest city of Indonesia."
-    }
     print(f"--- Tool Call: Searching Wikipedia for '{query}' ---")
-    return knowledge_base.get(query, "No information found.")
+    results = knowledge_base.search(query, k=SEARCH_RESULTS)
+    if not results:
+        return "No information found."
+    return "\n\n".join(f"{title}: {text}" for _, title, text in results)
 
 # Define a Signature for the agent
 class AgentSignature(dspy.Signature):
@@ -32,12 +82,130 @@ class AgentSignature(dspy.Signature):
     question = dspy.InputField()
     answer = dspy.OutputField(desc="factual answer based on tool output")
 
+def usage_tokens(tracker):
+    prompt = completion = 0
+    for usage in tracker.get_total_tokens().values():
+        prompt += usage.get("prompt_tokens") or 0
+        completion += usage.get("completion_tokens") or 0
+    return prompt, completion
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))] if values else 0.0
+
+class ReActStats:
+    """Thread-safe step counts and per-step timings across ToolAgent runs."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.steps_per_question = Counter()
+        self.stop_reasons = Counter()
+        self.llm_s = []
+        self.tool_s = []
+        self.step_tokens = []
+
+    def record(self, steps, stop_reason):
+        with self.lock:
+            self.steps_per_question[len(steps)] += 1
+            self.stop_reasons[stop_reason] += 1
+            for step in steps:
+                self.llm_s.append(step["llm_s"])
+                self.step_tokens.append(step["prompt_tokens"] + step["completion_tokens"])
+                if step["tool_s"] is not None:
+                    self.tool_s.append(step["tool_s"])
+
+    def summary(self):
+        with self.lock:
+            questions = sum(self.steps_per_question.values())
+            total_steps = sum(n * count for n, count in self.steps_per_question.items())
+            return {
+                "questions": questions,
+                "steps_per_question": dict(sorted(self.steps_per_question.items())),
+                "mean_steps": total_steps / questions if questions else 0.0,
+                "stop_reasons": dict(self.stop_reasons),
+                "llm_s": {"p50": percentile(self.llm_s, 50), "p95": percentile(self.llm_s, 95)},
+                "tool_s": {"p50": percentile(self.tool_s, 50), "p95": percentile(self.tool_s, 95)},
+                "tokens_per_step": sum(self.step_tokens) / len(self.step_tokens) if self.step_tokens else 0.0,
+            }
+
+    def export(self, path):
+        with open(path, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+
+react_stats = ReActStats()
+
+class InstrumentedReAct(dspy.ReAct):
+    """dspy.ReAct that times every think/act step and can stop early.
+
+    Each step records the LLM latency and tokens of the think call and the
+    latency of the tool it picked. After a tool call, `early_exit(tool_name,
+    tool_args)` may end the loop and go straight to answer extraction, saving
+    the LLM turn that would only have chosen "finish".
+    """
+
+    def __init__(self, signature, tools, max_iters=REACT_MAX_ITERS, early_exit=None, stats=None):
+        super().__init__(signature, tools=tools, max_iters=max_iters)
+        self.early_exit = early_exit
+        self.stats = stats
+
+    def forward(self, **input_args):
+        trajectory, steps = {}, []
+        max_iters = input_args.pop("max_iters", self.max_iters)
+        stop_reason = "budget"
+        for idx in range(max_iters):
+            start = time.perf_counter()
+            try:
+                with track_usage() as tracker:
+                    pred = self._call_with_potential_trajectory_truncation(self.react, trajectory, **input_args)
+            except (ContextWindowExceededError, ValueError) as err:
+                # Same as dspy.ReAct: a context overflow or an invalid tool choice ends the trajectory.
+                print(f"Ending the trajectory: {err}")
+                stop_reason = "error"
+                break
+            step = {"step": idx, "tool": pred.next_tool_name, "llm_s": time.perf_counter() - start, "tool_s": None}
+            step["prompt_tokens"], step["completion_tokens"] = usage_tokens(tracker)
+            steps.append(step)
+
+            trajectory[f"thought_{idx}"] = pred.next_thought
+            trajectory[f"tool_name_{idx}"] = pred.next_tool_name
+            trajectory[f"tool_args_{idx}"] = pred.next_tool_args
+            if pred.next_tool_name == "finish":
+                trajectory[f"observation_{idx}"] = "Completed."
+                stop_reason = "finish"
+                break
+
+            start = time.perf_counter()
+            try:
+                trajectory[f"observation_{idx}"] = self.tools[pred.next_tool_name](**pred.next_tool_args)
+            except Exception as err:
+                trajectory[f"observation_{idx}"] = f"Execution error in {pred.next_tool_name}: {err}"
+            step["tool_s"] = time.perf_counter() - start
+
+            if self.early_exit and self.early_exit(pred.next_tool_name, pred.next_tool_args):
+                stop_reason = "early_exit"
+                break
+
+        extract = self._call_with_potential_trajectory_truncation(self.extract, trajectory, **input_args)
+        if self.stats:
+            self.stats.record(steps, stop_reason)
+        return dspy.Prediction(trajectory=trajectory, steps=steps, stop_reason=stop_reason, **extract)
+
+def confident_search(tool_name, tool_args):
+    """Stop once the knowledge base is confident about the searched document."""
+    return tool_name == "search_wikipedia" and knowledge_base.confident(str(tool_args.get("query", "")))
+
 # Define the ReAct Agent
 class ToolAgent(dspy.Module):
-    def __init__(self):
+    def __init__(self, max_iters=REACT_MAX_ITERS, early_exit=REACT_EARLY_EXIT):
         super().__init__()
         # Initialize ReAct with the signature and tools
-        self.agent = dspy.ReAct(AgentSignature, tools=[search_wikipedia])
+        self.agent = InstrumentedReAct(
+            AgentSignature,
+            tools=[search_wikipedia],
+            max_iters=max_iters,
+            early_exit=confident_search if early_exit else None,
+            stats=react_stats,
+        )
     
     def forward(self, question):
         return self.agent(question=question)
@@ -48,6 +216,10 @@ def main():
         return
 
     agent = ToolAgent()
+    if COMPILED_PATH.exists():
+        start = time.perf_counter()
+        agent.load(str(COMPILED_PATH))
+        print(f"Loaded compiled program from {COMPILED_PATH.name} in {(time.perf_counter() - start) * 1000:.1f} ms")
     question = "What is Neosantara AI?"
     
     print(f"Question: {question}")
@@ -55,6 +227,19 @@ def main():
     response = agent(question=question)
     
     print(f"\nFinal Answer: {response.answer}")
+    for step in response.steps:
+        tool_s = f"{step['tool_s'] * 1000:.1f}ms" if step["tool_s"] is not None else "-"
+        print(
+            f"  step {step['step']}: {step['tool']:<16} llm {step['llm_s']:.2f}s  tool {tool_s}  "
+            f"{step['prompt_tokens'] + step['completion_tokens']} tokens"
+        )
+    print(f"  stopped by: {response.stop_reason}")
+
+    if REACT_STATS_PATH:
+        react_stats.export(REACT_STATS_PATH)
+
+    if llm_cache:
+        print(llm_cache.summary())
 
 if __name__ == "__main__":
     main()
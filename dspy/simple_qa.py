@@ -1,5 +1,8 @@
 import dspy
 import os
+import sys
+import time
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -11,11 +14,32 @@ api_key = os.getenv("NEOSANTARA_API_KEY")
 api_base = "https://api.neosantara.xyz/v1"
 model = "claude-3-haiku" # or any model available on Neosantara
 
+# Optional shared on-disk response cache (see ../shared/llm_cache.py), enabled by
+# LLM_CACHE_PATH. The cache sits on LiteLLM's HTTP client, so the LM below is
+# built with engine="litellm" instead of DSPy's default native engine.
+llm_cache = None
+if os.getenv("LLM_CACHE_PATH"):
+    import litellm
+
+    sys.path.append(str(Path(__file__).resolve().parents[1]))
+    from shared.llm_cache import LLMCache
+
+    llm_cache = LLMCache.from_env()
+    litellm.client_session = llm_cache.httpx_client()
+
 # Define the language model
 # In DSPy 3.x, use dspy.LM with the provider/model format
-lm = dspy.LM(f"openai/{model}", api_key=api_key, api_base=api_base)
+lm = dspy.LM(
+    f"openai/{model}",
+    api_key=api_key,
+    api_base=api_base,
+    **({"engine": "litellm"} if llm_cache else {}),
+)
 dspy.settings.configure(lm=lm)
 
+# Few-shot state written by `python optimize.py qa ...`; main() loads it when present.
+COMPILED_PATH = Path(__file__).resolve().parent / "compiled" / "qa.json"
+
 # Define a Signature for a simple QA task
 class SimpleQA(dspy.Signature):
     """Answer questions with short, factual responses."""
@@ -38,11 +62,18 @@ def main():
         return
 
     qa = QABot()
+    if COMPILED_PATH.exists():
+        start = time.perf_counter()
+        qa.load(str(COMPILED_PATH))
+        print(f"Loaded compiled program from {COMPILED_PATH.name} in {(time.perf_counter() - start) * 1000:.1f} ms")
     question = "What is the capital of Indonesia?"
     response = qa.forward(question=question)
     
     print(f"Question: {question}")
     print(f"Answer: {response.answer}")
 
+    if llm_cache:
+        print(llm_cache.summary())
+
 if __name__ == "__main__":
     main()
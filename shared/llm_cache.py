@@ -0,0 +1,264 @@
+"""
+Persistent on-disk LLM response cache shared by the Neosantara examples.
+
+Every example in this repo ends up POSTing OpenAI-compatible JSON to
+https://api.neosantara.xyz/v1 through an `httpx` client — the OpenAI SDK (the
+cookbook notebooks, AG2) and LiteLLM (DSPy, CrewAI) both use one under the
+hood. `LLMCache` plugs in at that layer: it hands out `httpx` clients whose
+transport looks up each request in a SQLite file before it goes to the network.
+
+The cache key is a hash of the endpoint plus the canonical JSON request body,
+i.e. the model, the messages and every sampling parameter. Only successful,
+non-streaming POST responses are stored. Entries expire after `ttl` seconds and
+the least recently used ones are evicted once the file's payload exceeds
+`max_bytes`.
+
+Usage:
+    from shared.llm_cache import LLMCache
+
+    cache = LLMCache("~/.cache/neosantara/llm_cache.sqlite")
+
+    # OpenAI SDK (cookbook notebooks)
+    client = OpenAI(base_url=..., api_key=..., http_client=cache.httpx_client())
+
+    # AG2: add to each config_list entry
+    {"model": ..., "http_client": cache.httpx_client()}
+
+    # DSPy / CrewAI (LiteLLM): the LLM must take the LiteLLM path, i.e.
+    # dspy.LM(..., engine="litellm") or crewai.LLM(..., is_litellm=True)
+    import litellm
+    litellm.client_session = cache.httpx_client()
+
+    print(cache.summary())   # "LLM cache: 12 hits, 3 misses, 0 bypassed (80.0% hit rate)"
+
+Optional env (read by `LLMCache.from_env()`):
+    LLM_CACHE_PATH      SQLite file. The cache is disabled when this is unset.
+    LLM_CACHE_TTL       Entry lifetime in seconds (default: 604800, one week).
+    LLM_CACHE_MAX_MB    Maximum cached payload size in MB (default: 256).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+DEFAULT_TTL = 7 * 24 * 3600
+DEFAULT_MAX_MB = 256
+
+# Response headers worth replaying. The body is stored already decoded, so
+# transfer headers like content-encoding/content-length must not be copied.
+_KEPT_HEADERS = ("content-type",)
+
+
+class LLMCache:
+    """SQLite-backed response store with TTL and size-based LRU eviction."""
+
+    def __init__(self, path, ttl: float = DEFAULT_TTL, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = Path(path).expanduser()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, status INTEGER, headers TEXT, body BLOB,"
+            " size INTEGER, created REAL, accessed REAL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+
+    @classmethod
+    def from_env(cls) -> Optional["LLMCache"]:
+        """Build a cache from LLM_CACHE_* env vars, or return None if LLM_CACHE_PATH is unset."""
+        path = os.environ.get("LLM_CACHE_PATH")
+        if not path:
+            return None
+        return cls(
+            path,
+            ttl=float(os.environ.get("LLM_CACHE_TTL", DEFAULT_TTL)),
+            max_bytes=int(float(os.environ.get("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB)) * 1024 * 1024),
+        )
+
+    # --- keys -------------------------------------------------------------
+
+    @staticmethod
+    def request_key(request: httpx.Request) -> Optional[str]:
+        """Hash of endpoint + canonical body, or None if the request must not be cached."""
+        if request.method != "POST":
+            return None
+        body = request.read()
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            canonical = body  # e.g. multipart audio uploads: hash the raw bytes
+        else:
+            if isinstance(payload, dict) and payload.get("stream"):
+                return None
+            canonical = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        digest = hashlib.sha256()
+        digest.update(f"{request.url.host}{request.url.path}\n".encode("utf-8"))
+        digest.update(canonical)
+        return digest.hexdigest()
+
+    # --- storage ----------------------------------------------------------
+
+    def get(self, key: str) -> Optional[tuple]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT status, headers, body, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            status, headers, body, created = row
+            if self.ttl and now - created > self.ttl:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self._conn.execute("UPDATE responses SET accessed = ? WHERE key = ?", (now, key))
+        return status, json.loads(headers), body
+
+    def set(self, key: str, status: int, headers: dict, body: bytes) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, status, json.dumps(headers), body, len(body), now, now),
+            )
+            self._evict(now)
+
+    def _evict(self, now: float) -> None:
+        if self.ttl:
+            self._conn.execute("DELETE FROM responses WHERE created < ?", (now - self.ttl,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM responses ORDER BY accessed"
+        ).fetchall():
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def clear(self) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    # --- request path -----------------------------------------------------
+
+    def lookup(self, request: httpx.Request) -> tuple:
+        """Return (key, cached httpx.Response or None) and update the counters."""
+        key = self.request_key(request)
+        if key is None:
+            with self._lock:
+                self.bypassed += 1
+            return None, None
+        cached = self.get(key)
+        with self._lock:
+            if cached is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        if cached is None:
+            return key, None
+        status, headers, body = cached
+        return key, httpx.Response(status, headers=headers, content=body, request=request)
+
+    def store(self, key: Optional[str], response: httpx.Response) -> None:
+        if key is None or response.status_code != 200:
+            return
+        headers = {name: response.headers[name] for name in _KEPT_HEADERS if name in response.headers}
+        self.set(key, response.status_code, headers, response.content)
+
+    def httpx_client(self, **kwargs) -> httpx.Client:
+        """An httpx.Client that serves cached responses; pass it as `http_client=`."""
+        return _CachingClient(transport=CachingTransport(self, httpx.HTTPTransport()), **kwargs)
+
+    def async_httpx_client(self, **kwargs) -> httpx.AsyncClient:
+        """An httpx.AsyncClient that serves cached responses (e.g. for AsyncOpenAI)."""
+        return _CachingAsyncClient(transport=AsyncCachingTransport(self, httpx.AsyncHTTPTransport()), **kwargs)
+
+    # --- reporting --------------------------------------------------------
+
+    def stats(self) -> dict:
+        with self._lock:
+            hits, misses, bypassed = self.hits, self.misses, self.bypassed
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "bypassed": bypassed,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"LLM cache: {s['hits']} hits, {s['misses']} misses, {s['bypassed']} bypassed "
+            f"({s['hit_rate']:.1%} hit rate)"
+        )
+
+
+class CachingTransport(httpx.BaseTransport):
+    def __init__(self, cache: LLMCache, transport: httpx.BaseTransport):
+        self.cache = cache
+        self.transport = transport
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        key, cached = self.cache.lookup(request)
+        if cached is not None:
+            return cached
+        response = self.transport.handle_request(request)
+        if key is not None and response.status_code == 200:
+            response.read()
+            self.cache.store(key, response)
+        return response
+
+    def close(self) -> None:
+        self.transport.close()
+
+
+class AsyncCachingTransport(httpx.AsyncBaseTransport):
+    def __init__(self, cache: LLMCache, transport: httpx.AsyncBaseTransport):
+        self.cache = cache
+        self.transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        # SQLite calls block, so they run on a worker thread instead of the event loop.
+        key, cached = await asyncio.to_thread(self.cache.lookup, request)
+        if cached is not None:
+            return cached
+        response = await self.transport.handle_async_request(request)
+        if key is not None and response.status_code == 200:
+            await response.aread()
+            await asyncio.to_thread(self.cache.store, key, response)
+        return response
+
+    async def aclose(self) -> None:
+        await self.transport.aclose()
+
+
+# AG2 deep-copies its llm_config; an httpx client must survive that as itself.
+class _CachingClient(httpx.Client):
+    def __deepcopy__(self, memo):
+        return self
+
+
+class _CachingAsyncClient(httpx.AsyncClient):
+    def __deepcopy__(self, memo):
+        return self